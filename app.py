@@ -1,16 +1,312 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, abort, g, render_template, jsonify, request, stream_with_context
+import click
 import requests
-from bs4 import BeautifulSoup
-import yfinance as yf
-import pandas as pd
-from urllib.parse import quote_plus
+from requests.adapters import HTTPAdapter
+import numpy as np
+from urllib.parse import quote_plus, urlencode, urlsplit
 from email.utils import parsedate_to_datetime
 import xml.etree.ElementTree as ET
 import time
+import atexit
 import csv
+import gzip
+import hashlib
+import json
+import socket
+import sqlite3
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 import os
+import random
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+
+        return monkey.is_module_patched("threading")
+    except ImportError:
+        return False
+
+
+def native_lock():
+    """
+    gevent yamasından etkilenmeyen kilit. Hem greenlet'lerden hem gerçek thread'lerden
+    (yfinance/hesap havuzları) girilen kısa, IO içermeyen kritik bölgeler içindir;
+    yamalı kilit başka bir thread'in hub'ına geçmeye çalışıp hata verir.
+    """
+    if _gevent_patched():
+        from gevent import monkey
+
+        return monkey.get_original("_thread", "allocate_lock")()
+    return threading.Lock()
+
+
+# Span histogram kovalarının üst sınırları (ms); sonuncunun üstü +Inf kovasıdır
+TIMING_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+TIMING_MAX_SERIES = 256
+
+
+class _Span:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name: str, labels: dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        self.registry.observe(self.name, elapsed_ms, self.labels, error=exc_type is not None)
+        return False
+
+
+class TimingRegistry:
+    """
+    Span süreleri için sabit kovalı histogramlar.
+    Her (ad, etiketler) serisi sabit boyutludur ve seri sayısı max_series ile sınırlıdır;
+    sınır aşılınca yeni etiketler adın "overflow" serisinde toplanır.
+    """
+
+    def __init__(self, buckets_ms=TIMING_BUCKETS_MS, max_series: int = TIMING_MAX_SERIES):
+        self.buckets_ms = tuple(buckets_ms)
+        self.max_series = max_series
+        self._series = {}
+        self._lock = native_lock()
+
+    def span(self, name: str, **labels):
+        """with TIMINGS.span("ad", etiket=...) as span: ... ; sonucu span.labels ile eklenebilir."""
+        return _Span(self, name, labels)
+
+    def observe(self, name: str, elapsed_ms: float, labels=None, error: bool = False):
+        key = (name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                if len(self._series) >= self.max_series:
+                    key = (name, (("overflow", "1"),))
+                    series = self._series.get(key)
+                if series is None:
+                    series = {"counts": [0] * (len(self.buckets_ms) + 1), "sum": 0.0, "count": 0, "max": 0.0, "errors": 0}
+                    self._series[key] = series
+            series["counts"][bisect_left(self.buckets_ms, elapsed_ms)] += 1
+            series["sum"] += elapsed_ms
+            series["count"] += 1
+            series["max"] = max(series["max"], elapsed_ms)
+            if error:
+                series["errors"] += 1
+
+    def _items(self):
+        with self._lock:
+            return sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+
+    def _quantile(self, series: dict, q: float):
+        target = q * series["count"]
+        seen = 0
+        for bound, count in zip(self.buckets_ms + (None,), series["counts"]):
+            seen += count
+            if seen >= target:
+                return series["max"] if bound is None else min(bound, series["max"])
+        return series["max"]
+
+    def snapshot(self):
+        spans = []
+        for (name, labels), series in self._items():
+            count = series["count"]
+            spans.append(
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": count,
+                    "errors": series["errors"],
+                    "mean_ms": round(series["sum"] / count, 3) if count else 0,
+                    "p50_ms": round(self._quantile(series, 0.5), 3),
+                    "p99_ms": round(self._quantile(series, 0.99), 3),
+                    "max_ms": round(series["max"], 3),
+                }
+            )
+        return spans
+
+    def prometheus(self, prefix: str = "app_span"):
+        """Prometheus metin biçimi; süreler saniye cinsindendir."""
+
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            escaped = (k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ") + '"' for k, v in pairs)
+            return "{" + ",".join(escaped) + "}"
+
+        items = self._items()
+        lines = [f"# TYPE {prefix}_seconds histogram"]
+        for (name, labels), series in items:
+            base = (("span", name),) + labels
+            cumulative = 0
+            for bound, count in zip(self.buckets_ms + (None,), series["counts"]):
+                cumulative += count
+                le = "+Inf" if bound is None else repr(bound / 1000)
+                lines.append(f"{prefix}_seconds_bucket{fmt(base, [('le', le)])} {cumulative}")
+            lines.append(f"{prefix}_seconds_sum{fmt(base)} {series['sum'] / 1000:.6f}")
+            lines.append(f"{prefix}_seconds_count{fmt(base)} {series['count']}")
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for (name, labels), series in items:
+            lines.append(f"{prefix}_errors_total{fmt((('span', name),) + labels)} {series['errors']}")
+        return "\n".join(lines) + "\n"
+
+
+TIMINGS = TimingRegistry()
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Upstream başına devre kesici.
+    Ardışık hatalarda açılır, jitter'lı üstel bekleme sonrası tek bir deneme isteğiyle (half-open) yoklar.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, base_delay: float = 5, max_delay: float = 300):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self._lock = native_lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() >= self.open_until:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trips = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.trips += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** (self.trips - 1))
+                self.open_until = time.monotonic() + random.uniform(delay / 2, delay)
+                self.state = "open"
+
+    def call(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "trips": self.trips,
+                "retry_in": round(max(0.0, self.open_until - time.monotonic()), 1) if self.state == "open" else 0,
+            }
+
+
+BREAKERS = {name: CircuitBreaker(name) for name in ("yahoo", "news", "translate")}
+
+HTTP_POOL_CONNECTIONS = 8
+HTTP_POOL_MAXSIZE = 4
+_HTTP_VALIDATORS = {}
+_HTTP_VALIDATORS_LOCK = threading.Lock()
+
+
+def _make_http_session():
+    session = requests.Session()
+    # Host başına en fazla HTTP_POOL_MAXSIZE bağlantı; dolunca istek boş bağlantıyı bekler
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=True,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+HTTP_SESSION = _make_http_session()
+
+
+def http_get(url: str, params=None, headers=None, timeout: float = 8, conditional: bool = False, breaker=None):
+    """
+    Paylaşılan keep-alive oturumuyla GET yapar ve gövdeyi metin olarak döndürür.
+    conditional=True ise ETag/Last-Modified saklanır; 304 gelirse önceki gövde kullanılır.
+    breaker verilirse çağrı o upstream'in devre kesicisinden geçer.
+    """
+    if breaker is not None:
+        return BREAKERS[breaker].call(http_get, url, params, headers, timeout, conditional)
+    key = url if not params else url + "?" + urlencode(sorted(params.items()))
+    req_headers = dict(headers or {})
+    cached = None
+    if conditional:
+        with _HTTP_VALIDATORS_LOCK:
+            cached = _HTTP_VALIDATORS.get(key)
+        if cached is not None:
+            if cached["etag"]:
+                req_headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                req_headers["If-Modified-Since"] = cached["last_modified"]
+    with TIMINGS.span("upstream.http", host=urlsplit(url).netloc) as span:
+        res = HTTP_SESSION.get(url, params=params, headers=req_headers, timeout=timeout)
+        span.labels["status"] = res.status_code
+    if res.status_code == 304 and cached is not None:
+        return cached["body"]
+    res.raise_for_status()
+    etag = res.headers.get("ETag")
+    last_modified = res.headers.get("Last-Modified")
+    if conditional and (etag or last_modified):
+        with _HTTP_VALIDATORS_LOCK:
+            _HTTP_VALIDATORS[key] = {"etag": etag, "last_modified": last_modified, "body": res.text}
+    return res.text
+
+
+def http_pool_stats():
+    """
+    Host başına istek sayısı, açılan yeni bağlantı ve yeniden kullanılan bağlantı sayısı.
+    """
+    stats = {}
+    for adapter in set(HTTP_SESSION.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}"
+            entry = stats.setdefault(host, {"requests": 0, "new_connections": 0, "reused": 0})
+            entry["requests"] += pool.num_requests
+            entry["new_connections"] += pool.num_connections
+            entry["reused"] += max(0, pool.num_requests - pool.num_connections)
+    return stats
 
 
 def _parse_tr_number(text: str):
@@ -19,7 +315,42 @@ def _parse_tr_number(text: str):
     return float(text.replace(".", "").replace(",", ".").strip())
 
 
+_SOCKET_SPAN_RE = re.compile(
+    r"""<span\b[^>]*?\bdata-socket-attr=["'](bid|ask)["'][^>]*>([^<]*)</span>""",
+    re.IGNORECASE,
+)
+
+
+def _extract_bid_ask_fast(html: str):
+    # İlk bid/ask span'i bulununca tarama durur; sayfanın geri kalanı okunmaz
+    found = {}
+    for match in _SOCKET_SPAN_RE.finditer(html):
+        attr = match.group(1).lower()
+        if attr not in found:
+            found[attr] = match.group(2)
+            if len(found) == 2:
+                break
+    if len(found) < 2:
+        return None, None
+    try:
+        return _parse_tr_number(found["bid"]), _parse_tr_number(found["ask"])
+    except ValueError:
+        return None, None
+
+
 def _extract_bid_ask(html: str):
+    with TIMINGS.span("parse.bid_ask", path="fast"):
+        bid, ask = _extract_bid_ask_fast(html)
+    if bid is not None and ask is not None:
+        return bid, ask
+    with TIMINGS.span("parse.bid_ask", path="soup"):
+        return _extract_bid_ask_soup(html)
+
+
+def _extract_bid_ask_soup(html: str):
+    # bs4, yfinance ve pandas ilk kullanımda yüklenir; import süresi soğuk başlangıca eklenmez
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
     bid_el = soup.select_one('span[data-socket-attr="bid"]')
     ask_el = soup.select_one('span[data-socket-attr="ask"]')
@@ -30,22 +361,122 @@ def _extract_bid_ask(html: str):
     return bid, ask
 
 
-def get_local_gold_data():
+# Upstream adresleri ortamdan değiştirilebilir; bench/ altındaki sahte sunucular bunu kullanır
+DOVIZ_BASE_URL = os.environ.get("DOVIZ_BASE_URL", "https://altin.doviz.com").rstrip("/")
+NEWS_BASE_URL = os.environ.get("NEWS_BASE_URL", "https://news.google.com").rstrip("/")
+TRANSLATE_URL = os.environ.get("TRANSLATE_URL", "https://translate.googleapis.com/translate_a/single")
+DOVIZ_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/122.0.0.0 Safari/537.36"
+    ),
+    "Accept-Language": "tr-TR,tr;q=0.9,en;q=0.8",
+}
+# Her kaynak banka/enstrüman hücresini, sayfasını, çıkarıcısını ve en sık çekilme aralığını (sn) bildirir
+QUOTE_SOURCES = [
+    {"bank": "garanti", "instrument": "gram", "url": DOVIZ_BASE_URL + "/garanti-bbva/gram-altin", "refresh": 10},
+    {"bank": "piyasa", "instrument": "gram", "url": DOVIZ_BASE_URL + "/gram-altin", "refresh": 10},
+    {"bank": "piyasa", "instrument": "ceyrek", "url": DOVIZ_BASE_URL + "/ceyrek-altin", "refresh": 30},
+    {"bank": "piyasa", "instrument": "yarim", "url": DOVIZ_BASE_URL + "/yarim-altin", "refresh": 30},
+    {"bank": "piyasa", "instrument": "tam", "url": DOVIZ_BASE_URL + "/tam-altin", "refresh": 60},
+    {"bank": "ziraat", "instrument": "gram", "url": DOVIZ_BASE_URL + "/ziraat-bankasi/gram-altin", "refresh": 30},
+    {"bank": "isbank", "instrument": "gram", "url": DOVIZ_BASE_URL + "/is-bankasi/gram-altin", "refresh": 30},
+    {"bank": "kuveytturk", "instrument": "gram", "url": DOVIZ_BASE_URL + "/kuveyt-turk/gram-altin", "refresh": 30},
+]
+LOCAL_QUOTE_KEYS = ("garanti:gram", "piyasa:gram")
+# Poller turu ile kaynak aralığı aynıysa küçük zamanlama kaymaları bir turu atlatmasın
+SOURCE_DUE_SLACK_SECONDS = 1
+_SOURCE_NEXT_DUE = {}
+_SOURCE_LOCK = threading.Lock()
+# doviz.com'a aynı anda en fazla bağlantı havuzu kadar istek: fazlası urllib3 kuyruğunda değil burada bekler
+_DOVIZ_SLOTS = threading.BoundedSemaphore(HTTP_POOL_MAXSIZE)
+
+
+def _source_key(source: dict):
+    return f"{source['bank']}:{source['instrument']}"
+
+
+# Bir sayfanın hatası diğer kaynakları kesmesin diye her kaynağın kendi devre kesicisi vardır
+for _source in QUOTE_SOURCES:
+    BREAKERS[f"doviz:{_source_key(_source)}"] = CircuitBreaker(f"doviz:{_source_key(_source)}")
+
+
+def _scrape_source(source: dict):
+    extract = source.get("extract", _extract_bid_ask)
+    with _DOVIZ_SLOTS:
+        html = http_get(source["url"], headers=DOVIZ_HEADERS, timeout=8, conditional=True)
+    alis, satis = extract(html)
+    if alis is None or satis is None:
+        # Sayfa geldi ama fiyat ayrıştırılamadı; upstream hatası gibi sayılır
+        raise ValueError(f"{_source_key(source)}: alış/satış bulunamadı")
+    return alis, satis
+
+
+def _fetch_source(source: dict):
+    return BREAKERS[f"doviz:{_source_key(source)}"].call(_scrape_source, source)
+
+
+def fetch_quote_sources(required=()):
     """
-    Garanti BBVA ve piyasa verilerini doviz.com'dan çeker.
-    Hata olursa dummy veri döndürür.
+    Vadesi gelen kaynakları (ve required içindekileri her durumda) paralel çeker.
+    Başarılı fiyatlar paylaşılan "quotes" matrisine yazılır.
+    Bu turda çekilen kaynaklar için (alis, satis) ya da hata ise None döndürür.
     """
-    url_garanti = "https://altin.doviz.com/garanti-bbva/gram-altin"
-    url_piyasa = "https://altin.doviz.com/gram-altin"
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/122.0.0.0 Safari/537.36"
-        ),
-        "Accept-Language": "tr-TR,tr;q=0.9,en;q=0.8",
+    now = time.monotonic()
+    with _SOURCE_LOCK:
+        due = [
+            source
+            for source in QUOTE_SOURCES
+            if _source_key(source) in required
+            or now + SOURCE_DUE_SLACK_SECONDS >= _SOURCE_NEXT_DUE.get(_source_key(source), 0)
+        ]
+        for source in due:
+            _SOURCE_NEXT_DUE[_source_key(source)] = now + source["refresh"]
+
+    futures = {_source_key(source): HTTP_POOL.submit(_fetch_source, source) for source in due}
+    results = _collect_futures(futures, UPSTREAM_DEADLINE_SECONDS)
+
+    quoted_at = int(time.time())
+    fresh = {
+        key: {"alis": quote[0], "satis": quote[1], "quoted_at": quoted_at}
+        for key, quote in results.items()
+        if quote is not None
     }
+    if fresh:
+        matrix, _ = SNAPSHOT_STORE.get("quotes")
+        matrix = dict(matrix or {})
+        matrix.update(fresh)
+        SNAPSHOT_STORE.put("quotes", matrix)
+    return results
+
+
+def get_quote_matrix():
+    """
+    Son fiyatları banka x enstrüman matrisi olarak döndürür.
+    Her hücre [alis, satis, yaş_sn] ya da hiç fiyat yoksa null'dır.
+    """
+    matrix, _ = SNAPSHOT_STORE.get("quotes")
+    matrix = matrix or {}
+    banks = list(dict.fromkeys(source["bank"] for source in QUOTE_SOURCES))
+    instruments = list(dict.fromkeys(source["instrument"] for source in QUOTE_SOURCES))
+    now = time.time()
+    rows = []
+    for bank in banks:
+        row = []
+        for instrument in instruments:
+            quote = matrix.get(f"{bank}:{instrument}")
+            row.append([quote["alis"], quote["satis"], int(now - quote["quoted_at"])] if quote else None)
+        rows.append(row)
+    return {"banks": banks, "instruments": instruments, "columns": ["alis", "satis", "age_seconds"], "quotes": rows}
 
+
+def get_local_gold_data():
+    """
+    Garanti BBVA ve piyasa gram fiyatlarını kaynak kayıtlarından çeker.
+    Vadesi gelen diğer kaynaklar da aynı turda paralel olarak yenilenir.
+    Hata olursa sıfır fiyatlı "offline" veri döndürür; son iyi değeri refresh_local_snapshot korur.
+    """
     data = {
         "garanti": {"alis": 0.0, "satis": 0.0},
         "piyasa": {"alis": 0.0, "satis": 0.0},
@@ -53,389 +484,1386 @@ def get_local_gold_data():
     }
 
     try:
-        res_g = requests.get(url_garanti, headers=headers, timeout=8)
-        res_g.raise_for_status()
-        g_alis, g_satis = _extract_bid_ask(res_g.text)
-        if g_alis is not None and g_satis is not None:
-            data["garanti"]["alis"] = g_alis
-            data["garanti"]["satis"] = g_satis
-
-        res_p = requests.get(url_piyasa, headers=headers, timeout=8)
-        res_p.raise_for_status()
-        p_alis, p_satis = _extract_bid_ask(res_p.text)
-        if p_alis is not None and p_satis is not None:
-            data["piyasa"]["alis"] = p_alis
-            data["piyasa"]["satis"] = p_satis
-
+        results = fetch_quote_sources(required=LOCAL_QUOTE_KEYS)
+        for key in LOCAL_QUOTE_KEYS:
+            quote = results.get(key)
+            if quote is None:
+                return _offline_local_data()
+            alis, satis = quote
+            data[key.split(":")[0]] = {"alis": alis, "satis": satis}
+
+        data["quoted_at"] = int(time.time())
         return data
     except Exception:
-        data["status"] = "offline"
-        data["garanti"] = {"alis": 2950.50, "satis": 3080.00}
-        data["piyasa"] = {"alis": 3000.00, "satis": 3010.00}
-        return data
+        return _offline_local_data()
+
+
+def _offline_local_data():
+    return {
+        "garanti": {"alis": 0.0, "satis": 0.0},
+        "piyasa": {"alis": 0.0, "satis": 0.0},
+        "status": "offline",
+    }
 
 app = Flask(__name__)
 
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.environ.get("DATA_DIR", BASE_DIR / "data"))
 ARBITRAGE_LOG_PATH = DATA_DIR / "arbitrage_history.csv"
-ARBITRAGE_LOG_INTERVAL = 900
-_LAST_ARBITRAGE_TS = 0
-
-NEWS_CACHE = {
-    "timestamp": 0,
-    "data": {"status": "offline", "national": [], "international": [], "updated_at": None},
+ARBITRAGE_DB_PATH = DATA_DIR / "arbitrage.db"
+ARBITRAGE_RING_SIZE = 8640
+ARBITRAGE_FLUSH_SECONDS = 60
+ARBITRAGE_FLUSH_BATCH = 512
+ARBITRAGE_ROLLUP_BUCKETS = (600, 3600, 86400)
+ARBITRAGE_BUCKETS = {
+    "hourly": (600, 144, "%H:%M"),
+    "daily": (3600, 24, "%H:%M"),
+    "weekly": (86400, 7, "%d %b"),
+    "monthly": (86400, 30, "%d %b"),
+    "yearly": (86400, 365, "%d %b %y"),
 }
+_LAST_ARBITRAGE_FLUSH = 0
+
+GRAM_PER_OUNCE = 31.1035
+SPREAD_SIGNAL_PCT = 1.5
+# (alan, pencere saniyesi, etiket): alan_etiket altında min/max/ortalama tutulur
+ROLLING_WINDOWS = (
+    ("arbitrage", 3600, "1h"),
+    ("spread_pct", 3600, "1h"),
+    ("gram_price", 86400, "24h"),
+)
+
+ALERT_RULES_PATH = Path(os.environ.get("ALERT_RULES_PATH", BASE_DIR / "alert_rules.json"))
+ALERT_LOG_PATH = DATA_DIR / "alerts.jsonl"
+ALERT_WEBHOOK_URL = os.environ.get("ALERT_WEBHOOK_URL", "")
+ALERT_RECENT_SIZE = 50
+ALERT_OPS = (">", "<", "cross", "change_pct")
+
 NEWS_TTL_SECONDS = 300
-TRANSLATE_CACHE = {}
+# Canlı haber yoksa (soğuk açılış ya da çekim hatası) yenileme bu kadar sonra yeniden denenir
+NEWS_RETRY_SECONDS = 15
+TRANSLATE_CACHE_PATH = DATA_DIR / "translate_cache.json"
+TRANSLATE_CACHE_SIZE = 2000
+TRANSLATE_TTL_SECONDS = 7 * 86400
+TRANSLATE_NEGATIVE_TTL_SECONDS = 1800
+
+LOCAL_REFRESH_SECONDS = 10
+LOCAL_STALE_SECONDS = 60
+LOCAL_FIRST_WAIT_SECONDS = 20
+GLOBAL_REFRESH_SECONDS = 60
+UPSTREAM_DEADLINE_SECONDS = 15
+STREAM_CHECK_SECONDS = 1
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_BACKLOG = 256
+_STREAM_SEEN = {}
+
+
+HTTP_WORKERS = 16
+YAHOO_WORKERS = 8
+COMPUTE_WORKERS = 4
+
+
+def _make_native_pool(max_workers: int, name: str):
+    # gevent worker'da thread'ler greenlet'e dönüşür; yfinance (curl_cffi) gibi
+    # bloklayan C çağrıları event loop'u durdurmasın diye gerçek thread havuzu kullanılır
+    if _gevent_patched():
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+
+        return NativeThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+
+# requests/urllib3 ile yapılan HTTP çağrıları: gevent altında yamalı thread'ler greenlet olduğundan
+# bu havuz greenlet'lerle çalışır. Yamalı soket ve bağlantı havuzu gerçek thread'lerden kullanılamaz.
+HTTP_POOL = ThreadPoolExecutor(max_workers=HTTP_WORKERS, thread_name_prefix="http")
+# yfinance çekimleri ve bar deposu yazımları gerçek thread'lerde
+YAHOO_POOL = _make_native_pool(YAHOO_WORKERS, "yahoo")
+# pandas, numpy ve serileştirme işleri için ayrı havuz; yavaş upstream'ler hesap işlerini sıraya sokmasın
+COMPUTE_POOL = _make_native_pool(COMPUTE_WORKERS, "compute")
+OFF_LOOP = _gevent_patched()
+
+
+def run_off_loop(func, *args):
+    """
+    gevent altında CPU ağırlıklı işi gerçek bir thread'de çalıştırır; istek greenlet'i
+    sonucu beklerken event loop diğer bağlantılara hizmet etmeye devam eder.
+    Thread'li sunucularda doğrudan çağırır. func saf hesap olmalıdır: HTTP çağrısı,
+    snapshot deposu ya da yamalı kilit kullanmamalı, havuzlara iş göndermemelidir.
+    """
+    if not OFF_LOOP:
+        return func(*args)
+    return COMPUTE_POOL.submit(func, *args).result()
+
+
+_POLLER_LOCK = threading.Lock()
+REFRESH_LEASE_SECONDS = 60
+_INFLIGHT = set()
+_INFLIGHT_LOCK = threading.Lock()
+_GLOBAL_COLD_LOCK = threading.Lock()
+_POLLER_THREAD = None
+
+BARS_DIR = DATA_DIR / "bars"
+BAR_COLUMNS = ("ts", "open", "high", "low", "close")
+BAR_SEED_PERIODS = {"5m": "5d", "15m": "5d", "30m": "5d", "60m": "1mo", "1h": "1mo", "1d": "1y"}
+BAR_MIN_REFETCH_SECONDS = 30
+INTRADAY_RETENTION_DAYS = 30
+DAILY_INTERVALS = {"1d", "5d", "1wk", "1mo", "3mo"}
+INTERVAL_SECONDS = {"5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "1h": 3600, "1d": 86400}
+_BAR_LOCKS = {}
+# Bar güncellemeleri yalnızca gerçek thread'li YAHOO_POOL'da çalışır
+_BAR_LOCKS_GUARD = native_lock()
+_BAR_FETCHED_AT = {}
+
+# Uzun vadeli arşiv: bar deposuyla aynı biçim, saklama süresi yok
+ARCHIVE_DIR = DATA_DIR / "archive"
+# Yahoo'nun verdiği en uzun geçmiş: 1h için ~730 gün, 1d için tamamı
+ARCHIVE_SEED_PERIODS = {"1d": "max", "1h": "730d"}
+ARCHIVE_SYMBOLS = {"ons": "GC=F", "usdtry": "TRY=X", "us10y": "^TNX"}
+ARCHIVE_GRAM_SYMBOL = "GRAM"
+ARCHIVE_DECIMALS = {"ons": 2, "usdtry": 4, "us10y": 3, "gram": 2}
+ARCHIVE_REFRESH_SECONDS = 6 * 3600
+ARCHIVE_DEADLINE_SECONDS = 120
+# interval=auto iken bu süreden kısa aralıklar saatlik arşivden okunur
+ARCHIVE_INTRADAY_MAX_DAYS = 60
+HISTORY_DEFAULT_POINTS = 500
+HISTORY_MAX_POINTS = 5000
+_ARCHIVE_LOCK = threading.Lock()
+
+_RESPONSE_CACHE = {}
+_COMPACT_CACHE = {}
+_RESPONSE_LOCK = threading.Lock()
+
+SNAPSHOT_BACKEND = os.environ.get("SNAPSHOT_BACKEND", "sqlite").lower()
+SNAPSHOT_DB_PATH = DATA_DIR / "snapshot.db"
+# Veritabanı başına boşta tutulan en fazla bağlantı
+SQLITE_POOL_SIZE = 4
+# Kapanışta yazılan, açılışta depoya geri yüklenen son tam snapshot
+WARM_SNAPSHOT_PATH = DATA_DIR / "warm_snapshot.json"
+WARM_SNAPSHOT_KEYS = ("local", "metrics", "quotes", "news")
+LEASE_NAME = "refresher"
+LEASE_TTL_SECONDS = 60
 
 HISTORY_PRESETS = {
-    "hourly": {"period": "2d", "interval": "5m", "date_fmt": "%H:%M", "max_points": 144},
-    "daily": {"period": "2d", "interval": "1h", "date_fmt": "%H:%M", "max_points": 24},
-    "weekly": {"period": "7d", "interval": "1d", "date_fmt": "%d %b", "max_points": 7},
-    "monthly": {"period": "1mo", "interval": "1d", "date_fmt": "%d %b", "max_points": 30},
+    "hourly": {"source": "intraday", "period": "2d", "resample": "10min", "date_fmt": "%H:%M", "max_points": 144},
+    "daily": {"source": "intraday", "period": "2d", "resample": "1h", "date_fmt": "%H:%M", "max_points": 24},
+    "weekly": {"source": "daily", "period": "7d", "resample": "D", "date_fmt": "%d %b", "max_points": 7},
+    "monthly": {"source": "daily", "period": "1mo", "resample": "D", "date_fmt": "%d %b", "max_points": 30},
+    "yearly": {"source": "daily", "period": "1y", "resample": "D", "date_fmt": "%d %b %y", "max_points": 365},
+}
+# Presetler bu kaynaklardan türetilir: (en geniş periyot, denenecek interval zinciri)
+HISTORY_SOURCES = {
+    "intraday": ("2d", ["5m", "15m", "30m", "60m", "1h"]),
+    "daily": ("1y", ["1d"]),
+}
+GLOBAL_TICKERS = {
+    "ONS": ["GC=F", "XAUUSD=X"],
+    "USDTRY": ["TRY=X"],
+    "US10Y": ["^TNX"],
 }
+# (anahtar, geçmiş sütunu, ondalık basamak)
+PRICE_COLUMNS = (("ONS", "ons_prices", 2), ("USDTRY", "usd_prices", 4), ("US10Y", "us10y_prices", 2))
+HISTORY_COLUMNS = (
+    "dates",
+    "timestamps",
+    "ons_prices",
+    "usd_prices",
+    "us10y_prices",
+    "gram_prices",
+    "arbitrage_prices",
+    "arbitrage_dates",
+    "arbitrage_timestamps",
+)
+# (önek, zaman sütunu, aynı zaman eksenini paylaşan sütunlar)
+HISTORY_TIMELINES = (
+    ("", "timestamps", ("dates", "timestamps", "ons_prices", "usd_prices", "us10y_prices", "gram_prices")),
+    ("arbitrage_", "arbitrage_timestamps", ("arbitrage_dates", "arbitrage_timestamps", "arbitrage_prices")),
+)
+
+# İsteğe bağlı sütun bazlı ikili biçim: ?format=compact ya da Accept ile seçilir
+COMPACT_MEDIA_TYPE = "application/vnd.goldinsight.compact"
+COMPACT_MAGIC = b"GIC1"
+# Değer sütunu -> ondalık basamak; istemci Float32 değerleri bu basamağa yuvarlayarak JSON ile aynı sayıyı elde eder
+COMPACT_DIGITS = {"ons_prices": 2, "usd_prices": 4, "us10y_prices": 2, "gram_prices": 2, "arbitrage_prices": 2}
+# script.js'deki etiket biçimlendiricisinin desteklediği strftime alanları
+COMPACT_DATE_FIELDS = {"H", "M", "d", "b", "m", "y", "Y"}
+COMPACT_GZIP_LEVEL = 6
+
+
+class MemorySnapshotStore:
+    """
+    Tek süreçlik snapshot deposu. Lease her zaman bu sürece aittir.
+    """
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}
 
-@app.route("/")
-def index():
-    return render_template("index.html")
+    def get(self, key: str):
+        with self._lock:
+            item = self._items.get(key)
+        if item is None:
+            return None, 0
+        return json.loads(item[0]), item[1]
+
+    def timestamp(self, key: str):
+        with self._lock:
+            item = self._items.get(key)
+        return item[1] if item else 0
+
+    def put(self, key: str, value, updated_at: float = None):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._items[key] = (payload, updated_at or time.time())
 
+    def acquire_lease(self, name: str, owner: str, ttl: int):
+        return True
 
-def get_global_data(range_key: str = "daily"):
+
+class SqlitePool:
     """
-    ONS Altin (GC=F), USD/TRY (TRY=X) ve ABD 10Y (^TNX) verilerini çeker.
-    Son kapanış ve yüzde değişimi döndürür.
-    Ayrıca ONS ve USD/TRY için seçilen aralığa göre kapanış serisini döndürür.
+    Greenlet'ler ve thread'ler arasında paylaşılan, kilitle korunan küçük SQLite bağlantı havuzu.
+    gevent altında threading.local greenlet başına olduğundan bağlantılar istek başına açılmaz,
+    ödünç verilip geri alınır. setup(conn) süreç başına bir kez, ilk bağlantıda çalışır.
     """
-    if range_key == "yearly":
-        range_key = "monthly"
-    preset = HISTORY_PRESETS.get(range_key, HISTORY_PRESETS["daily"])
-    tickers = {
-        "ONS": ["GC=F", "XAUUSD=X"],
-        "USDTRY": ["TRY=X"],
-        "US10Y": ["^TNX"],
-    }
-    result = {}
-    history = {
-        "dates": [],
-        "ons_prices": [],
-        "usd_prices": [],
-        "us10y_prices": [],
-        "gram_prices": [],
-        "arbitrage_prices": [],
-        "arbitrage_dates": [],
-    }
-    try:
-        series_map = {}
-        interval = preset["interval"]
-        intraday = interval in {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
-
-        if intraday:
-            # Intraday'de tek tek çek + gerekirse daha geniş interval fallback
-            fallback_intervals = ["15m", "30m", "60m", "1h"]
-            interval_candidates = [interval] + [iv for iv in fallback_intervals if iv != interval]
-
-            def _download_close(symbol: str):
-                for iv in interval_candidates:
-                    try:
-                        df = yf.download(
-                            symbol,
-                            period=preset["period"],
-                            interval=iv,
-                            progress=False,
-                            threads=False,
-                        )
-                    except Exception:
-                        continue
-                    if df is None or df.empty:
-                        continue
-                    close_data = df.get("Close")
-                    if close_data is None:
-                        continue
-                    if isinstance(close_data, pd.DataFrame):
-                        if symbol in close_data.columns:
-                            close_series = close_data[symbol]
-                        elif close_data.shape[1] == 1:
-                            close_series = close_data.iloc[:, 0]
-                        else:
-                            continue
-                    else:
-                        close_series = close_data
-                    close_series = close_series.dropna()
-                    if not close_series.empty:
-                        return close_series
+
+    def __init__(self, path: Path, setup=None, size: int = SQLITE_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._setup = setup
+        self._ready = setup is None
+        self._idle = []
+        self._lock = native_lock()
+        self._setup_lock = native_lock()
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _prepare(self, conn):
+        with self._setup_lock:
+            if not self._ready:
+                self._setup(conn)
+                self._ready = True
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            if not self._ready:
+                self._prepare(conn)
+            yield conn
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+
+class SqliteSnapshotStore:
+    """
+    Gunicorn worker'ları arasında paylaşılan, WAL modunda SQLite snapshot deposu.
+    Lease tablosu, upstream çekimini tek bir worker'ın yapmasını sağlar.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._pool = SqlitePool(path, setup=self._create_schema)
+
+    @staticmethod
+    def _create_schema(conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases "
+            "(name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str):
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT value, updated_at FROM snapshots WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def timestamp(self, key: str):
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT updated_at FROM snapshots WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def put(self, key: str, value, updated_at: float = None):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO snapshots (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (key, payload, updated_at or time.time()),
+            )
+
+    def acquire_lease(self, name: str, owner: str, ttl: int):
+        now = time.time()
+        with self._pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (name, owner, now + ttl, now),
+            )
+            row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == owner
+
+
+class StreamHub:
+    """
+    SSE aboneleri için tek yayın noktası.
+    Olaylar sıra numaralı ortak bir halkada tutulur; abone başına kuyruk yoktur.
+    """
+
+    def __init__(self, backlog: int = STREAM_BACKLOG):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=backlog)
+        self._latest = {}
+        self.seq = 0
+
+    def publish(self, event: str, data):
+        payload = json.dumps(data, ensure_ascii=False)
+        with self._cond:
+            self.seq += 1
+            self._events.append((self.seq, event, payload))
+            self._latest[event] = (self.seq, event, payload)
+            self._cond.notify_all()
+
+    def latest(self):
+        with self._cond:
+            return sorted(self._latest.values()), self.seq
+
+    def wait(self, after_seq: int, timeout: float):
+        with self._cond:
+            if self.seq <= after_seq:
+                self._cond.wait(timeout)
+            return [item for item in self._events if item[0] > after_seq], self.seq
+
+
+STREAM_HUB = StreamHub()
+
+
+class TranslationCache:
+    """
+    Boyutu sınırlı, süreli LRU çeviri önbelleği.
+    Başarısız çeviriler ("") daha kısa sürede düşer; içerik diske JSON olarak kaydedilir.
+    """
+
+    def __init__(self, path: Path, max_size: int, ttl: int, negative_ttl: int):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+
+    def _load(self):
+        self._loaded = True
+        try:
+            entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for text, translated, expires_at in entries[-self.max_size:]:
+            if expires_at > now:
+                self._items[text] = (translated, expires_at)
+
+    def get(self, text: str):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            item = self._items.get(text)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                del self._items[text]
                 return None
+            self._items.move_to_end(text)
+            return item[0]
+
+    def put(self, text: str, translated: str):
+        ttl = self.ttl if translated else self.negative_ttl
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._items[text] = (translated, time.time() + ttl)
+            self._items.move_to_end(text)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[text, item[0], item[1]] for text, item in self._items.items()]
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+TRANSLATE_CACHE = TranslationCache(
+    TRANSLATE_CACHE_PATH, TRANSLATE_CACHE_SIZE, TRANSLATE_TTL_SECONDS, TRANSLATE_NEGATIVE_TTL_SECONDS
+)
+
+
+class TickRing:
+    """
+    Son fiyat tick'lerini sabit boyutlu bir numpy dizisinde tutan halka tampon.
+    Diske yazılmamış satırlar takip edilir; halka dolarsa en eski bekleyenler düşer.
+    """
 
-            def _download_daily(symbol: str):
-                try:
-                    df = yf.download(
-                        symbol,
-                        period="7d",
-                        interval="1d",
-                        progress=False,
-                        threads=False,
-                    )
-                except Exception:
-                    return None
-                if df is None or df.empty:
-                    return None
-                close_data = df.get("Close")
-                if close_data is None:
-                    return None
-                if isinstance(close_data, pd.DataFrame):
-                    if symbol in close_data.columns:
-                        close_series = close_data[symbol]
-                    elif close_data.shape[1] == 1:
-                        close_series = close_data.iloc[:, 0]
-                    else:
-                        return None
-                else:
-                    close_series = close_data
-                close_series = close_series.dropna()
-                if close_series.empty:
-                    return None
-                return close_series
+    def __init__(self, capacity: int, width: int):
+        self.capacity = capacity
+        self._data = np.zeros((capacity, width))
+        self._lock = threading.Lock()
+        self._written = 0
+        self._flushed = 0
 
-            for key, symbols in tickers.items():
-                close_series = None
-                for symbol in symbols:
-                    close_series = _download_close(symbol)
-                    if close_series is not None and not close_series.empty:
-                        break
-                if close_series is not None and not close_series.empty:
-                    series_map[key] = close_series
-
-            # ONS intraday boş gelirse günlük kapanışla sabitle
-            if "ONS" not in series_map:
-                ref_index = None
-                if series_map:
-                    ref_index = next(iter(series_map.values())).index
-                for symbol in tickers["ONS"]:
-                    daily_series = _download_daily(symbol)
-                    if daily_series is None or daily_series.empty:
-                        continue
-                    last_val = float(daily_series.iloc[-1])
-                    if ref_index is not None:
-                        series_map["ONS"] = pd.Series([last_val] * len(ref_index), index=ref_index)
-                    else:
-                        series_map["ONS"] = pd.Series([last_val] * len(daily_series), index=daily_series.index)
-                    break
-        else:
-            primary_symbols = [symbols[0] for symbols in tickers.values()]
-            hist_df = yf.download(
-                primary_symbols,
-                period=preset["period"],
-                interval=interval,
-                progress=False,
-                threads=False,
+    def append(self, row):
+        with self._lock:
+            self._data[self._written % self.capacity] = row
+            self._written += 1
+            self._flushed = max(self._flushed, self._written - self.capacity)
+
+    def _rows(self, begin: int, end: int):
+        return self._data[np.arange(begin, end) % self.capacity].copy()
+
+    def pending_count(self):
+        with self._lock:
+            return self._written - self._flushed
+
+    def pending(self):
+        with self._lock:
+            return self._rows(self._flushed, self._written), self._written
+
+    def mark_flushed(self, end: int):
+        with self._lock:
+            self._flushed = max(self._flushed, end)
+
+    def recent(self, count: int):
+        with self._lock:
+            begin = max(0, self._written - min(count, self.capacity))
+            return self._rows(begin, self._written)
+
+
+ARBITRAGE_TICKS = TickRing(ARBITRAGE_RING_SIZE, 5)
+
+
+class GramPrice:
+    inputs = ("ons", "usdtry")
+
+    def update(self, state):
+        return {"gram_price": round(state["ons"] * state["usdtry"] / GRAM_PER_OUNCE, 2)}
+
+
+class Spread:
+    inputs = ("garanti_alis", "garanti_satis")
+
+    def __init__(self, signal_pct: float = SPREAD_SIGNAL_PCT):
+        self.signal_pct = signal_pct
+
+    def update(self, state):
+        alis = state["garanti_alis"] or 0
+        spread = (state["garanti_satis"] or 0) - alis
+        spread_pct = (spread / alis) * 100 if alis else 0
+        return {
+            "spread_tl": round(spread, 2),
+            "spread_pct": round(spread_pct, 2),
+            "signal": "BEKLE (Yüksek Makas)" if spread_pct > self.signal_pct else "İŞLEM UYGUN",
+        }
+
+
+class Arbitrage:
+    inputs = ("piyasa_satis", "garanti_alis")
+
+    def update(self, state):
+        return {"arbitrage": round((state["piyasa_satis"] or 0) - (state["garanti_alis"] or 0), 2)}
+
+
+class RollingWindow:
+    """
+    Bir alanın son window_seconds içindeki min/max/ortalamasını tutar.
+    Monoton kuyruklar ve kayan toplam sayesinde her tick amortize O(1) maliyetlidir.
+    """
+
+    def __init__(self, field: str, window_seconds: int, label: str):
+        self.inputs = (field,)
+        self.field = field
+        self.window_seconds = window_seconds
+        self.output = f"{field}_{label}"
+        self._items = deque()
+        self._mins = deque()
+        self._maxs = deque()
+        self._sum = 0.0
+
+    def update(self, state):
+        ts, value = state["ts"], float(state[self.field])
+        self._items.append((ts, value))
+        self._sum += value
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((ts, value))
+        while self._maxs and self._maxs[-1][1] <= value:
+            self._maxs.pop()
+        self._maxs.append((ts, value))
+
+        cutoff = ts - self.window_seconds
+        while self._items[0][0] <= cutoff:
+            self._sum -= self._items.popleft()[1]
+        while self._mins[0][0] <= cutoff:
+            self._mins.popleft()
+        while self._maxs[0][0] <= cutoff:
+            self._maxs.popleft()
+        return {
+            self.output: {
+                "min": round(self._mins[0][1], 2),
+                "max": round(self._maxs[0][1], 2),
+                "mean": round(self._sum / len(self._items), 2),
+                "count": len(self._items),
+            }
+        }
+
+
+class AlertEngine:
+    """
+    Kural listesini bir kez derler; her tick'te kuralı olan metrikleri gezer, eşik kurallarına
+    yalnızca değeri değişen metriklerde bakılır. Eşik kuralları metrik başına sıralı seviye listelerinde
+    tutulur; bir güncellemede tetiklenenler, önceki ve yeni değer arasındaki seviyeler olarak bisect ile
+    bulunur. Kurallar geçişte bir kez tetiklenir. Metriğin ilk gözleminde (açılış, yeniden başlatma)
+    zaten sağlanan > ve < kuralları da bir kez tetiklenir; cross için geçiş gerekir.
+
+    Kural biçimleri:
+        {"id": "...", "metric": "spread_pct", "op": ">", "value": 1.5}
+        {"id": "...", "metric": "arbitrage", "op": "cross", "value": 50}
+        {"id": "...", "metric": "gram_price", "op": "change_pct", "value": 1.0, "window": 3600}
+    """
+
+    def __init__(self, rules, sinks=()):
+        self.sinks = list(sinks)
+        self._rising = {}
+        self._falling = {}
+        self._moves = {}
+        self._last = {}
+        self._lock = threading.Lock()
+        self.rule_count = 0
+        rising, falling, moves = {}, {}, {}
+        for rule in rules:
+            try:
+                metric, op, level = rule["metric"], rule["op"], float(rule["value"])
+                window = int(rule["window"]) if op == "change_pct" else None
+            except (KeyError, TypeError, ValueError):
+                continue
+            if op not in ALERT_OPS:
+                continue
+            rule = dict(rule, id=str(rule.get("id") or f"{metric}{op}{level}"))
+            if op in (">", "cross"):
+                rising.setdefault(metric, []).append((level, rule))
+            if op in ("<", "cross"):
+                falling.setdefault(metric, []).append((level, rule))
+            if op == "change_pct":
+                moves.setdefault((metric, window), []).append((abs(level), rule))
+            self.rule_count += 1
+        for target, source in ((self._rising, rising), (self._falling, falling)):
+            for metric, entries in source.items():
+                entries.sort(key=lambda entry: entry[0])
+                target[metric] = ([level for level, _ in entries], [rule for _, rule in entries])
+        for (metric, window), entries in moves.items():
+            entries.sort(key=lambda entry: entry[0])
+            self._moves.setdefault(metric, []).append(
+                {
+                    "window": window,
+                    "samples": deque(),
+                    "change": 0.0,
+                    "levels": [level for level, _ in entries],
+                    "rules": [rule for _, rule in entries],
+                }
             )
-            if isinstance(hist_df.columns, pd.MultiIndex):
-                close_df = hist_df["Close"]
-            else:
-                close_df = hist_df
-            if isinstance(close_df, pd.Series):
-                close_df = close_df.to_frame()
-
-            for key, symbols in tickers.items():
-                symbol = symbols[0]
-                if symbol not in close_df.columns:
+        self.metrics = set(self._rising) | set(self._falling) | set(self._moves)
+
+    def evaluate(self, ts: int, values: dict):
+        fired = []
+        with self._lock:
+            for metric in self.metrics:
+                value = values.get(metric)
+                if not isinstance(value, (int, float)):
+                    continue
+                prev = self._last.get(metric)
+                self._last[metric] = value
+                fired += self._moved(metric, ts, value)
+                if prev is None:
+                    fired += self._initial(metric, value)
                     continue
-                series = close_df[symbol].dropna()
-                if not series.empty:
-                    series_map[key] = series
+                if prev == value:
+                    continue
+                if value > prev and metric in self._rising:
+                    levels, rules = self._rising[metric]
+                    hits = rules[bisect_left(levels, prev):bisect_left(levels, value)]
+                    fired += [(rule, value, prev) for rule in hits]
+                if value < prev and metric in self._falling:
+                    levels, rules = self._falling[metric]
+                    hits = rules[bisect_right(levels, value):bisect_right(levels, prev)]
+                    fired += [(rule, value, prev) for rule in hits]
+        alerts = [
+            {
+                "ts": int(ts),
+                "rule": rule["id"],
+                "metric": rule["metric"],
+                "op": rule["op"],
+                "level": rule["value"],
+                "value": value,
+                "previous": prev,
+                "message": rule.get("message", ""),
+            }
+            for rule, value, prev in fired
+        ]
+        if alerts:
+            for sink in self.sinks:
+                try:
+                    sink(alerts)
+                except Exception:
+                    pass
+        return alerts
+
+    def _initial(self, metric: str, value: float):
+        # Önceki değer yok: seviye geçişi aranmaz, o an sağlanan eşik kuralları bir kez tetiklenir
+        fired = []
+        if metric in self._rising:
+            levels, rules = self._rising[metric]
+            fired += [(rule, value, None) for rule in rules[:bisect_left(levels, value)] if rule["op"] == ">"]
+        if metric in self._falling:
+            levels, rules = self._falling[metric]
+            fired += [(rule, value, None) for rule in rules[bisect_right(levels, value):] if rule["op"] == "<"]
+        return fired
+
+    def _moved(self, metric: str, ts: int, value: float):
+        # Pencere başındaki değere göre yüzde değişim; eşik yukarı doğru aşılınca tetiklenir
+        fired = []
+        for group in self._moves.get(metric, ()):
+            samples = group["samples"]
+            samples.append((ts, value))
+            while samples[0][0] <= ts - group["window"]:
+                samples.popleft()
+            base = samples[0][1]
+            change = abs(value - base) / abs(base) * 100 if base else 0.0
+            prev_change, group["change"] = group["change"], change
+            if change > prev_change:
+                levels = group["levels"]
+                for rule in group["rules"][bisect_right(levels, prev_change):bisect_right(levels, change)]:
+                    fired.append((rule, value, base))
+        return fired
+
+
+def load_alert_rules(path: Path):
+    """
+    JSON kural dosyasını okur; dosya yoksa veya bozuksa kural yoktur.
+    Dosya bir liste ya da {"rules": [...]} olabilir.
+    """
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    rules = data.get("rules", []) if isinstance(data, dict) else data
+    return [rule for rule in rules if isinstance(rule, dict)]
+
+
+def _make_operators():
+    operators = [GramPrice(), Spread(), Arbitrage()]
+    operators += [RollingWindow(field, seconds, label) for field, seconds, label in ROLLING_WINDOWS]
+    return operators
+
+
+class TickPipeline:
+    """
+    Kaynaklardan gelen tick'leri operatörlerden geçirip türetilmiş metrikleri sink'lere iletir.
+    Operatör yalnızca girdilerinden biri bu tick'te değiştiyse çalışır; yeni metrik için
+    operatör eklemek yeterlidir, route kodu değişmez.
+    """
 
-            # Eksik kalanlar için fallback sembolleri dene
-            for key, symbols in tickers.items():
-                if key in series_map:
+    def __init__(self, operators, sinks=()):
+        self.operators = operators
+        self.sinks = list(sinks)
+        self._state = {}
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def push(self, source: str, tick: dict):
+        with TIMINGS.span("pipeline.push", source=source):
+            return self._push(source, tick)
+
+    def _push(self, source: str, tick: dict):
+        with self._lock:
+            self._state.update(tick)
+            changed = set(tick)
+            for operator in self.operators:
+                if changed.isdisjoint(operator.inputs):
                     continue
-                for symbol in symbols[1:]:
-                    try:
-                        df = yf.download(
-                            symbol,
-                            period=preset["period"],
-                            interval=interval,
-                            progress=False,
-                            threads=False,
-                        )
-                    except Exception:
-                        continue
-                    if df is None or df.empty:
-                        continue
-                    close_data = df.get("Close")
-                    if close_data is None:
-                        continue
-                    if isinstance(close_data, pd.DataFrame):
-                        if symbol in close_data.columns:
-                            close_series = close_data[symbol]
-                        elif close_data.shape[1] == 1:
-                            close_series = close_data.iloc[:, 0]
-                        else:
-                            continue
-                    else:
-                        close_series = close_data
-                    close_series = close_series.dropna()
-                    if not close_series.empty:
-                        series_map[key] = close_series
-                        break
-
-        history_df = pd.DataFrame()
-        if series_map:
-            history_df = pd.DataFrame(series_map).sort_index()
-            history_df = history_df.dropna(axis=1, how="all")
-            if not history_df.empty:
-                history_df = history_df.ffill().bfill()
-                if range_key == "hourly":
-                    history_df = history_df.resample("10min").last().ffill()
-                elif range_key == "daily":
-                    history_df = history_df.resample("1h").last().ffill()
-                elif range_key in {"weekly", "monthly"}:
-                    history_df = history_df.resample("D").last().ffill()
-                max_points = preset.get("max_points")
-                if max_points:
-                    history_df = history_df.tail(max_points)
-
-                history["dates"] = [idx.strftime(preset["date_fmt"]) for idx in history_df.index]
-                if "ONS" in history_df:
-                    history["ons_prices"] = [round(float(v), 2) for v in history_df["ONS"].tolist()]
-                if "USDTRY" in history_df:
-                    history["usd_prices"] = [round(float(v), 4) for v in history_df["USDTRY"].tolist()]
-                if "US10Y" in history_df:
-                    history["us10y_prices"] = [round(float(v), 2) for v in history_df["US10Y"].tolist()]
-
-                if "ONS" in history_df and "USDTRY" in history_df:
-                    gram_series = history_df["ONS"] * history_df["USDTRY"] / 31.1035
-                    history["gram_prices"] = [round(float(v), 2) for v in gram_series.tolist()]
-
-                history["arbitrage_prices"] = []
-                history["arbitrage_dates"] = []
-
-            for key in ["ONS", "USDTRY", "US10Y"]:
-                series = series_map.get(key)
-                if series is None or series.empty:
-                    result[key] = {"price": 0, "change": 0}
+                if any(key not in self._state for key in operator.inputs):
                     continue
+                outputs = operator.update(self._state)
+                self._state.update(outputs)
+                self._derived.update(outputs)
+                changed.update(outputs)
+            derived = dict(self._derived)
+        for sink in self.sinks:
+            try:
+                sink(source, tick, derived)
+            except Exception:
+                pass
+        return derived
 
-                range_series = None
-                if not history_df.empty and key in history_df:
-                    range_series = history_df[key].dropna()
-
-                if range_series is None or range_series.empty:
-                    range_series = series
-
-                current = float(range_series.iloc[-1])
-                if len(range_series) > 1:
-                    prev = float(range_series.iloc[0])
-                else:
-                    prev = current
-                change = ((current - prev) / prev) * 100 if prev != 0 else 0
-                result[key] = {
-                    "price": round(current, 2),
-                    "change": round(change, 2),
-                }
 
-            if history["dates"] and range_key not in {"hourly", "daily"}:
-                _ensure_today_tail(
-                    history["dates"],
-                    [
-                        history["ons_prices"],
-                        history["usd_prices"],
-                        history["us10y_prices"],
-                        history["gram_prices"],
-                    ],
-                    preset["date_fmt"],
-                    preset.get("max_points"),
-                )
+def _make_snapshot_store():
+    if SNAPSHOT_BACKEND == "memory":
+        return MemorySnapshotStore()
+    return SqliteSnapshotStore(SNAPSHOT_DB_PATH)
+
+
+SNAPSHOT_STORE = _make_snapshot_store()
+
+
+def _bar_path(symbol: str, interval: str, root: Path = None):
+    safe = re.sub(r"[^A-Za-z0-9]+", "_", symbol).strip("_")
+    return (root or BARS_DIR) / f"{safe}_{interval}.npy"
+
+
+def load_bars(symbol: str, interval: str, root: Path = None):
+    """
+    Diskteki bar deposunu (ts, open, high, low, close) satırlarından oluşan
+    sütun bazlı bir dizi olarak memmap ile açar. root verilmezse BARS_DIR kullanılır.
+    """
+    path = _bar_path(symbol, interval, root)
+    if not path.exists():
+        return np.empty((len(BAR_COLUMNS), 0))
+    try:
+        return np.load(path, mmap_mode="r")
     except Exception:
-        result = {
-            "ONS": {"price": 0, "change": 0},
-            "USDTRY": {"price": 0, "change": 0},
-            "US10Y": {"price": 0, "change": 0},
+        return np.empty((len(BAR_COLUMNS), 0))
+
+
+def _save_bars(symbol: str, interval: str, bars, root: Path = None):
+    path = _bar_path(symbol, interval, root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        np.save(f, np.ascontiguousarray(bars))
+    os.replace(tmp_path, path)
+
+
+def _yahoo_history(symbol: str, interval: str, period=None, start=None):
+    import yfinance as yf
+    from yfinance.exceptions import YFPricesMissingError
+
+    # yf.download paylaşılan global state kullandığı için thread'lerde Ticker.history tercih edilir
+    try:
+        if start is not None:
+            return yf.Ticker(symbol).history(start=start, interval=interval, raise_errors=True)
+        return yf.Ticker(symbol).history(period=period, interval=interval, raise_errors=True)
+    except YFPricesMissingError:
+        # Piyasa kapalıyken boş pencere normaldir; upstream hatası sayılmaz
+        return None
+
+
+def _download_history(symbol: str, interval: str, period=None, start=None):
+    with TIMINGS.span("upstream.yahoo", symbol=symbol, interval=interval) as span:
+        try:
+            df = BREAKERS["yahoo"].call(_yahoo_history, symbol, interval, period=period, start=start)
+        except CircuitOpenError:
+            span.labels["outcome"] = "circuit_open"
+            return None
+        except Exception:
+            span.labels["outcome"] = "error"
+            return None
+        if df is None or df.empty or "Close" not in df:
+            span.labels["outcome"] = "empty"
+            return None
+        span.labels["outcome"] = "ok"
+    return df
+
+
+def _frame_to_bars(df, interval: str):
+    df = df[["Open", "High", "Low", "Close"]].dropna(subset=["Close"])
+    idx = df.index
+    if interval in DAILY_INTERVALS and idx.tz is not None:
+        idx = idx.tz_localize(None)
+    ts = idx.as_unit("s").asi8.astype("float64")
+    return np.vstack([ts, df.to_numpy(dtype="float64").T])
+
+
+def update_bars(symbol: str, interval: str):
+    """
+    Sembol/interval deposuna yalnızca son kayıttan sonraki barları çekip ekler.
+    Depo boşsa BAR_SEED_PERIODS kadar geçmişle doldurulur.
+    """
+    key = (symbol, interval)
+    with _BAR_LOCKS_GUARD:
+        lock = _BAR_LOCKS.setdefault(key, native_lock())
+    with lock:
+        bars = load_bars(symbol, interval)
+        fetched_at = _BAR_FETCHED_AT.get(key, 0)
+        if time.monotonic() - fetched_at < BAR_MIN_REFETCH_SECONDS:
+            return bars
+        _BAR_FETCHED_AT[key] = time.monotonic()
+
+        if bars.shape[1] == 0:
+            df = _download_history(symbol, interval, period=BAR_SEED_PERIODS.get(interval, "1mo"))
+        else:
+            # Son bar hâlâ oluşuyor olabilir; birkaç bar geriden başlayıp üzerine yaz
+            overlap = 3 * INTERVAL_SECONDS.get(interval, 86400)
+            start = datetime.fromtimestamp(float(bars[0, -1]) - overlap, tz=timezone.utc)
+            df = _download_history(symbol, interval, start=start)
+        if df is None:
+            return bars
+
+        merged = _merge_bars(bars, _frame_to_bars(df, interval))
+        if interval not in DAILY_INTERVALS:
+            cutoff = merged[0, -1] - INTRADAY_RETENTION_DAYS * 86400
+            merged = merged[:, merged[0] >= cutoff]
+        _save_bars(symbol, interval, merged)
+        return load_bars(symbol, interval)
+
+
+def _merge_bars(bars, new_bars):
+    merged = np.hstack([np.asarray(bars), new_bars])
+    # Aynı zaman damgasında yeni gelen bar eskisinin yerine geçer
+    _, last_idx = np.unique(merged[0, ::-1], return_index=True)
+    return merged[:, merged.shape[1] - 1 - last_idx]
+
+
+def update_archive(symbol: str, interval: str):
+    """
+    Arşive yalnızca son kayıttan sonraki barları ekler.
+    Arşiv boşsa ARCHIVE_SEED_PERIODS kadar geriye gidilir; eski barlar hiç silinmez.
+    """
+    bars = load_bars(symbol, interval, ARCHIVE_DIR)
+    if bars.shape[1] == 0:
+        df = _download_history(symbol, interval, period=ARCHIVE_SEED_PERIODS[interval])
+    else:
+        overlap = 3 * INTERVAL_SECONDS[interval]
+        start = datetime.fromtimestamp(float(bars[0, -1]) - overlap, tz=timezone.utc)
+        df = _download_history(symbol, interval, start=start)
+    if df is None:
+        return bars
+    _save_bars(symbol, interval, _merge_bars(bars, _frame_to_bars(df, interval)), ARCHIVE_DIR)
+    return load_bars(symbol, interval, ARCHIVE_DIR)
+
+
+def _derive_gram_archive(interval: str):
+    ons = load_bars(ARCHIVE_SYMBOLS["ons"], interval, ARCHIVE_DIR)
+    usd = load_bars(ARCHIVE_SYMBOLS["usdtry"], interval, ARCHIVE_DIR)
+    if ons.shape[1] == 0 or usd.shape[1] == 0:
+        return
+    # Her ONS barı, o an ya da öncesindeki son USD/TRY kapanışıyla çevrilir
+    idx = np.searchsorted(usd[0], ons[0], side="right") - 1
+    valid = idx >= 0
+    rate = np.asarray(usd[4])[idx[valid]]
+    gram = np.vstack([np.asarray(ons[0])[valid], np.asarray(ons[1:])[:, valid] * rate / GRAM_PER_OUNCE])
+    _save_bars(ARCHIVE_GRAM_SYMBOL, interval, gram, ARCHIVE_DIR)
+
+
+def backfill_archive(intervals=tuple(ARCHIVE_SEED_PERIODS)):
+    """
+    Arşiv sembollerini paralel olarak günceller, ardından gram serisini yeniden türetir.
+    Interval ve sembol başına arşivdeki bar sayısını döndürür.
+    """
+    with _ARCHIVE_LOCK, TIMINGS.span("archive.backfill"):
+        futures = {
+            f"{symbol}:{interval}": YAHOO_POOL.submit(update_archive, symbol, interval)
+            for symbol in ARCHIVE_SYMBOLS.values()
+            for interval in intervals
+        }
+        _collect_futures(futures, ARCHIVE_DEADLINE_SECONDS)
+        for interval in intervals:
+            _derive_gram_archive(interval)
+        summary = {
+            f"{symbol}:{interval}": int(load_bars(symbol, interval, ARCHIVE_DIR).shape[1])
+            for symbol in list(ARCHIVE_SYMBOLS.values()) + [ARCHIVE_GRAM_SYMBOL]
+            for interval in intervals
         }
+    SNAPSHOT_STORE.put("archive", summary)
+    return summary
+
+
+def read_archive(key: str, interval: str, start_ts: float, end_ts: float):
+    """
+    Arşivden [start_ts, end_ts] aralığındaki kapanışları okur.
+    Bar dosyası memmap ile açıldığı için yalnızca aralığa düşen sayfalar diskten okunur.
+    """
+    symbol = ARCHIVE_GRAM_SYMBOL if key == "gram" else ARCHIVE_SYMBOLS[key]
+    bars = load_bars(symbol, interval, ARCHIVE_DIR)
+    if bars.shape[1] == 0:
+        return np.empty(0), np.empty(0)
+    lo = int(np.searchsorted(bars[0], start_ts, side="left"))
+    hi = int(np.searchsorted(bars[0], end_ts, side="right"))
+    return np.asarray(bars[0, lo:hi]), np.asarray(bars[4, lo:hi])
+
+
+def lttb(x, y, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets: grafiğin görsel şeklini koruyarak seriyi threshold noktaya indirir.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def minmax_buckets(x, y, threshold: int):
+    """
+    Seriyi threshold/2 kovaya böler ve her kovanın min ile max noktasını zaman sırasıyla tutar.
+    Tepe ve dipler hiç kaybolmaz.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 2:
+        return x, y
+    edges = np.linspace(0, n, threshold // 2 + 1).astype(np.int64)
+    bucket_ids = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    # Kova, sonra değer sırasına dizilince her kovanın ilk elemanı min, sonuncusu max olur
+    order = np.lexsort((y, bucket_ids))
+    keep = np.unique(np.concatenate([order[edges[:-1]], order[edges[1:] - 1]]))
+    return x[keep], y[keep]
+
+
+HISTORY_DOWNSAMPLERS = {"lttb": lttb, "minmax": minmax_buckets}
+
+
+def _parse_history_bound(value, default: float, end_of_day: bool = False):
+    if not value:
+        return default
+    if value.isdigit():
+        return float(value)
+    try:
+        day_start = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return default
+    # end=YYYY-MM-DD o günün barlarını da kapsar; read_archive aralığı iki uçta da kapalıdır
+    return day_start + 86399 if end_of_day else day_start
+
+
+def get_history_response(args):
+    """
+    Arşivden istenen serileri, tarih aralığını ve nokta sayısını sunucu tarafında indirgeyerek döndürür.
+    Parametreler: series=ons,usdtry,us10y,gram  start/end=YYYY-MM-DD ya da epoch
+    points=500  method=lttb|minmax  interval=auto|1d|1h
+    """
+    now = time.time()
+    end_ts = _parse_history_bound(args.get("end"), now, end_of_day=True)
+    start_ts = _parse_history_bound(args.get("start"), end_ts - 365 * 86400)
+    points = max(2, min(HISTORY_MAX_POINTS, args.get("points", HISTORY_DEFAULT_POINTS, type=int) or HISTORY_DEFAULT_POINTS))
+    method = args.get("method", "lttb")
+    if method not in HISTORY_DOWNSAMPLERS:
+        method = "lttb"
+    interval = args.get("interval", "auto")
+    if interval not in ARCHIVE_SEED_PERIODS:
+        interval = "1h" if end_ts - start_ts <= ARCHIVE_INTRADAY_MAX_DAYS * 86400 else "1d"
+    keys = [key for key in args.get("series", "ons,usdtry,gram").split(",") if key in ARCHIVE_DECIMALS]
+
+    series = {}
+    with TIMINGS.span("history.archive", interval=interval, method=method):
+        for key in keys:
+            x, y = read_archive(key, interval, start_ts, end_ts)
+            source_points = len(x)
+            x, y = HISTORY_DOWNSAMPLERS[method](x, y, points)
+            series[key] = {
+                "timestamps": x.astype(np.int64).tolist(),
+                "values": np.round(y, ARCHIVE_DECIMALS[key]).tolist(),
+                "source_points": source_points,
+            }
+    return {
+        "interval": interval,
+        "method": method,
+        "start": int(start_ts),
+        "end": int(end_ts),
+        "series": series,
+    }
+
+
+def _period_window(series, period: str):
+    import pandas as pd
+
+    # yfinance'teki gibi "Nd" son N işlem günü, "Nmo"/"Ny" takvim aralığıdır
+    if period.endswith("mo"):
+        cutoff = series.index[-1] - pd.DateOffset(months=int(period[:-2]))
+        return series[series.index > cutoff]
+    if period.endswith("y"):
+        cutoff = series.index[-1] - pd.DateOffset(years=int(period[:-1]))
+        return series[series.index > cutoff]
+    if period.endswith("d"):
+        days = series.index.normalize()
+        keep = days.unique()[-int(period[:-1]):]
+        return series[days >= keep[0]]
+    return series
+
+
+def _download_close(symbol: str, period: str, interval: str):
+    import pandas as pd
+
+    bars = update_bars(symbol, interval)
+    if bars.shape[1] == 0:
+        return None
+    index = pd.to_datetime(np.asarray(bars[0], dtype="int64"), unit="s", utc=interval not in DAILY_INTERVALS)
+    close_series = pd.Series(np.asarray(bars[4]), index=index).dropna()
+    if close_series.empty:
+        return None
+    close_series = _period_window(close_series, period)
+    if close_series.empty:
+        return None
+    return close_series
+
+
+def _fetch_close_chain(symbols, period: str, intervals):
+    # Her deneme ayrı etiketlenir; hangi sembol/interval fallback'inin kullanıldığı sayaçlardan okunur
+    for symbol in symbols:
+        for iv in intervals:
+            with TIMINGS.span("history.attempt", symbol=symbol, interval=iv) as span:
+                close_series = _download_close(symbol, period, iv)
+                span.labels["result"] = "miss" if close_series is None else "hit"
+            if close_series is not None:
+                return close_series
+    return None
+
+
+def _collect_futures(futures: dict, timeout: float):
+    """
+    Tüm future'ları tek bir ortak süre sınırıyla bekler.
+    Süresi dolan ya da hata veren işler None olarak döner.
+    """
+    done, pending = wait(futures.values(), timeout=timeout)
+    for future in pending:
+        future.cancel()
+    results = {}
+    for key, future in futures.items():
+        if future not in done or future.exception() is not None:
+            results[key] = None
+        else:
+            results[key] = future.result()
+    return results
+
+
+@app.route("/")
+def index():
+    return render_template("index.html")
+
+
+def get_global_histories():
+    """
+    ONS Altin (GC=F), USD/TRY (TRY=X) ve ABD 10Y (^TNX) barlarını kaynak başına bir kez çeker
+    ve tüm aralık presetlerini aynı barlardan tek geçişte üretir.
+    Her aralık için son kapanış, yüzde değişimi ve sütun bazlı geçmiş döndürür.
+    """
+    import pandas as pd
+
+    # Her anahtar kendi sembol/interval zincirini sırayla dener; anahtarlar ve kaynaklar paralel çalışır
+    futures = {
+        (source, key): YAHOO_POOL.submit(_fetch_close_chain, symbols, period, intervals)
+        for source, (period, intervals) in HISTORY_SOURCES.items()
+        for key, symbols in GLOBAL_TICKERS.items()
+    }
+    sources = {source: {} for source in HISTORY_SOURCES}
+    for (source, key), series in _collect_futures(futures, UPSTREAM_DEADLINE_SECONDS).items():
+        if series is not None:
+            sources[source][key] = series
+
+    # ONS intraday boş gelirse günlük kapanışla sabitle
+    intraday, daily = sources["intraday"], sources["daily"]
+    if "ONS" not in intraday and "ONS" in daily:
+        ref_index = next(iter(intraday.values())).index if intraday else daily["ONS"].index
+        intraday["ONS"] = pd.Series(float(daily["ONS"].iloc[-1]), index=ref_index)
+    return run_off_loop(_build_histories, sources)
+
+
+def _build_histories(sources: dict):
+    histories = {}
+    for range_key, preset in HISTORY_PRESETS.items():
+        with TIMINGS.span("history.build", range=range_key):
+            histories[range_key] = _build_range_data(sources[preset["source"]], preset)
+    return histories
+
+
+def _rounded(values, digits: int):
+    return np.round(np.asarray(values, dtype="float64"), digits).tolist()
+
+
+def _build_range_data(series_map: dict, preset: dict):
+    import pandas as pd
+
+    result = {}
+    history = {column: [] for column in HISTORY_COLUMNS}
+    try:
+        frame = pd.DataFrame()
+        if series_map:
+            frame = pd.DataFrame(
+                {key: _period_window(series, preset["period"]) for key, series in series_map.items()}
+            ).sort_index()
+            frame = frame.dropna(axis=1, how="all")
+        if not frame.empty:
+            frame = frame.ffill().bfill()
+            frame = frame.resample(preset["resample"]).last().ffill().tail(preset["max_points"])
+            history["dates"] = frame.index.strftime(preset["date_fmt"]).tolist()
+            history["timestamps"] = _epoch_seconds(frame.index)
+            for key, column, digits in PRICE_COLUMNS:
+                if key in frame:
+                    history[column] = _rounded(frame[key], digits)
+            if "ONS" in frame and "USDTRY" in frame:
+                gram = frame["ONS"].to_numpy() * frame["USDTRY"].to_numpy() / GRAM_PER_OUNCE
+                history["gram_prices"] = _rounded(gram, 2)
+
+        for key, _, _ in PRICE_COLUMNS:
+            range_series = frame[key].dropna() if key in frame else series_map.get(key)
+            if range_series is None or range_series.empty:
+                result[key] = {"price": 0, "change": 0}
+                continue
+            current = float(range_series.iloc[-1])
+            prev = float(range_series.iloc[0])
+            change = ((current - prev) / prev) * 100 if prev != 0 else 0
+            result[key] = {
+                "price": round(current, 2),
+                "change": round(change, 2),
+            }
+
+        if history["dates"] and preset["source"] == "daily":
+            _ensure_today_tail(
+                history["dates"],
+                [
+                    history["ons_prices"],
+                    history["usd_prices"],
+                    history["us10y_prices"],
+                    history["gram_prices"],
+                ],
+                preset["date_fmt"],
+                preset.get("max_points"),
+                history["timestamps"],
+            )
+    except Exception:
+        result = {key: {"price": 0, "change": 0} for key, _, _ in PRICE_COLUMNS}
+        history = {column: [] for column in HISTORY_COLUMNS}
 
     result["history"] = history
     return result
 
 
-def _ensure_arbitrage_log():
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
+def _setup_arbitrage_db(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    # ts INTEGER PRIMARY KEY rowid'dir; aralık sorguları ve MAX(ts) B-ağacı üzerinden çalışır
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS arbitrage ("
+        "ts INTEGER PRIMARY KEY, garanti_alis REAL, garanti_satis REAL, "
+        "piyasa_alis REAL, piyasa_satis REAL, arbitrage REAL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS arbitrage_rollup ("
+        "bucket INTEGER NOT NULL, start INTEGER NOT NULL, last REAL, last_ts INTEGER, "
+        "min REAL, max REAL, sum REAL, count INTEGER, PRIMARY KEY (bucket, start)) WITHOUT ROWID"
+    )
+    _migrate_arbitrage_csv(conn)
+    _backfill_arbitrage_rollups(conn)
+
+
+# Şema, CSV göçü ve rollup doldurma süreç başına bir kez, ilk bağlantıda çalışır
+_ARBITRAGE_DB = SqlitePool(ARBITRAGE_DB_PATH, setup=_setup_arbitrage_db)
+
+
+def _migrate_arbitrage_csv(conn):
+    """
+    Eski arbitrage_history.csv dosyasını bir kez SQLite'a aktarır ve dosyayı .migrated olarak saklar.
+    """
     if not ARBITRAGE_LOG_PATH.exists():
-        with ARBITRAGE_LOG_PATH.open("w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(
-                ["timestamp", "garanti_alis", "garanti_satis", "piyasa_alis", "piyasa_satis", "arbitrage"]
-            )
+        return
+    rows = []
+    with ARBITRAGE_LOG_PATH.open("r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                ts = int(datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S").timestamp())
+                rows.append(
+                    (
+                        ts,
+                        float(row["garanti_alis"]),
+                        float(row["garanti_satis"]),
+                        float(row["piyasa_alis"]),
+                        float(row["piyasa_satis"]),
+                        float(row["arbitrage"]),
+                    )
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR IGNORE INTO arbitrage VALUES (?, ?, ?, ?, ?, ?)", rows)
+    try:
+        ARBITRAGE_LOG_PATH.rename(ARBITRAGE_LOG_PATH.with_name(ARBITRAGE_LOG_PATH.name + ".migrated"))
+    except OSError:
+        pass
+
+
+def _local_wall_clock(ts: int):
+    # Kovalar yerel saate göre hizalanır; değer, yerel saatin UTC gibi okunmuş epoch'udur.
+    # Yalnızca kova anahtarı ve etiket içindir, istemciye gerçek epoch gönderilir
+    return ts + int(datetime.fromtimestamp(ts).astimezone().utcoffset().total_seconds())
+
+
+def _wall_clock_epoch(wall: int):
+    # _local_wall_clock'un tersi; ofset, yaklaşık gerçek an üzerinden yeniden hesaplanır (yaz saati geçişleri)
+    offset = int(datetime.fromtimestamp(wall).astimezone().utcoffset().total_seconds())
+    return wall - int(datetime.fromtimestamp(wall - offset).astimezone().utcoffset().total_seconds())
+
+
+def _rollup_rows(ts: int, value: float):
+    wall = _local_wall_clock(ts)
+    return [(bucket, wall - wall % bucket, value, ts, value, value, value) for bucket in ARBITRAGE_ROLLUP_BUCKETS]
+
+
+def _apply_rollups(conn, samples):
+    rows = [row for ts, value in samples for row in _rollup_rows(ts, value)]
+    conn.executemany(
+        "INSERT INTO arbitrage_rollup (bucket, start, last, last_ts, min, max, sum, count) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 1) "
+        "ON CONFLICT(bucket, start) DO UPDATE SET "
+        "last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END, "
+        "last_ts = MAX(last_ts, excluded.last_ts), "
+        "min = MIN(min, excluded.min), max = MAX(max, excluded.max), "
+        "sum = sum + excluded.sum, count = count + 1",
+        rows,
+    )
+
+
+def _backfill_arbitrage_rollups(conn):
+    """
+    Rollup tablosu boşsa mevcut ham kayıtlardan bir kez doldurur.
+    """
+    if conn.execute("SELECT 1 FROM arbitrage_rollup LIMIT 1").fetchone():
+        return
+    samples = conn.execute("SELECT ts, arbitrage FROM arbitrage ORDER BY ts").fetchall()
+    if not samples:
+        return
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM arbitrage_rollup LIMIT 1").fetchone():
+            return
+        _apply_rollups(conn, samples)
 
 
 def _get_last_arbitrage_ts():
-    if not ARBITRAGE_LOG_PATH.exists():
-        return 0
     try:
-        with ARBITRAGE_LOG_PATH.open("r", encoding="utf-8") as f:
-            lines = f.read().strip().splitlines()
-        if len(lines) < 2:
-            return 0
-        last = lines[-1].split(",")[0]
-        dt = datetime.strptime(last, "%Y-%m-%d %H:%M:%S")
-        return int(dt.timestamp())
+        with _ARBITRAGE_DB.connection() as conn:
+            row = conn.execute("SELECT MAX(ts) FROM arbitrage").fetchone()
+        return int(row[0]) if row and row[0] is not None else 0
     except Exception:
         return 0
 
 
-def log_arbitrage(local):
-    global _LAST_ARBITRAGE_TS
-    if local.get("status") != "live":
-        return
-    _ensure_arbitrage_log()
+def log_arbitrage(tick):
+    """
+    Canlı fiyat tick'ini halkaya ekler.
+    Halka, ARBITRAGE_FLUSH_SECONDS'ta bir veya dolmaya yaklaşınca toplu olarak diske yazılır.
+    """
     now = int(time.time())
-    if _LAST_ARBITRAGE_TS == 0:
-        _LAST_ARBITRAGE_TS = _get_last_arbitrage_ts()
-    if now - _LAST_ARBITRAGE_TS < ARBITRAGE_LOG_INTERVAL:
-        return
+    ARBITRAGE_TICKS.append(
+        (int(tick["ts"]), tick["garanti_alis"], tick["garanti_satis"], tick["piyasa_alis"], tick["piyasa_satis"])
+    )
 
-    g_alis = local.get("garanti", {}).get("alis", 0) or 0
-    g_satis = local.get("garanti", {}).get("satis", 0) or 0
-    p_alis = local.get("piyasa", {}).get("alis", 0) or 0
-    p_satis = local.get("piyasa", {}).get("satis", 0) or 0
-    arbitrage = round(p_satis - g_alis, 2)
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if now - _LAST_ARBITRAGE_FLUSH >= ARBITRAGE_FLUSH_SECONDS or ARBITRAGE_TICKS.pending_count() >= ARBITRAGE_FLUSH_BATCH:
+        flush_arbitrage_ticks()
 
-    with ARBITRAGE_LOG_PATH.open("a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([ts, g_alis, g_satis, p_alis, p_satis, arbitrage])
 
-    _LAST_ARBITRAGE_TS = now
+def flush_arbitrage_ticks():
+    global _LAST_ARBITRAGE_FLUSH
+    _LAST_ARBITRAGE_FLUSH = int(time.time())
+    rows, end = ARBITRAGE_TICKS.pending()
+    if not len(rows):
+        return
+    with TIMINGS.span("arbitrage.flush"), _ARBITRAGE_DB.connection() as conn, conn:
+        conn.execute("BEGIN IMMEDIATE")
+        inserted = []
+        for ts, g_alis, g_satis, p_alis, p_satis in rows.tolist():
+            arbitrage = round(p_satis - g_alis, 2)
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO arbitrage VALUES (?, ?, ?, ?, ?, ?)",
+                (int(ts), g_alis, g_satis, p_alis, p_satis, arbitrage),
+            )
+            if cur.rowcount:
+                inserted.append((int(ts), arbitrage))
+        _apply_rollups(conn, inserted)
+    ARBITRAGE_TICKS.mark_flushed(end)
 
 
 def get_arbitrage_history(range_key: str):
-    if not ARBITRAGE_LOG_PATH.exists():
-        return {"dates": [], "values": []}
+    """
+    Aralığın kovalarını yazma anında güncellenen rollup tablosundan okur.
+    Boş kovalar, kendinden önceki kovanın son değeriyle doldurulur.
+    """
+    bucket, points, date_fmt = ARBITRAGE_BUCKETS.get(range_key, ARBITRAGE_BUCKETS["daily"])
+    empty = {"dates": [], "timestamps": [], "values": []}
+    with TIMINGS.span("arbitrage.history", range=range_key):
+        return _read_arbitrage_rollups(bucket, points, date_fmt, empty)
+
+
+def _read_arbitrage_rollups(bucket: int, points: int, date_fmt: str, empty: dict):
     try:
-        df = pd.read_csv(ARBITRAGE_LOG_PATH, parse_dates=["timestamp"])
-        if df.empty:
-            return {"dates": [], "values": []}
-        df = df.sort_values("timestamp").set_index("timestamp")
-        if range_key == "yearly":
-            range_key = "monthly"
-        if range_key == "hourly":
-            series = df["arbitrage"].resample("10min").last().ffill().dropna().tail(144)
-            date_fmt = "%H:%M"
-        elif range_key == "daily":
-            series = df["arbitrage"].resample("H").last().ffill().dropna().tail(24)
-            date_fmt = "%H:%M"
-        else:
-            series = df["arbitrage"].resample("D").last().ffill().dropna()
-            if range_key == "weekly":
-                series = series.tail(7)
-            else:
-                series = series.tail(30)
-            date_fmt = "%d %b"
+        with _ARBITRAGE_DB.connection() as conn:
+            row = conn.execute("SELECT MAX(start) FROM arbitrage_rollup WHERE bucket = ?", (bucket,)).fetchone()
+            if not row or row[0] is None:
+                return empty
+            last_start = row[0]
+            window_start = last_start - (points - 1) * bucket
+            rows = conn.execute(
+                "SELECT start, last FROM arbitrage_rollup WHERE bucket = ? AND start < ? ORDER BY start DESC LIMIT 1",
+                (bucket, window_start),
+            ).fetchall()
+            rows += conn.execute(
+                "SELECT start, last FROM arbitrage_rollup WHERE bucket = ? AND start >= ? ORDER BY start",
+                (bucket, window_start),
+            ).fetchall()
+        values_by_start = dict(rows)
+        first = max(window_start, rows[0][0])
+        current = values_by_start.get(rows[0][0]) if rows[0][0] < first else None
+        starts, values = [], []
+        for start in range(first, last_start + bucket, bucket):
+            current = values_by_start.get(start, current)
+            if current is None:
+                continue
+            starts.append(start)
+            values.append(round(float(current), 2))
+        # Etiketler yerel saat kovasından, zaman damgaları ana eksenle aynı gerçek UTC epoch'tan
         return {
-            "dates": [idx.strftime(date_fmt) for idx in series.index],
-            "values": [round(float(v), 2) for v in series.tolist()],
+            "dates": [datetime.fromtimestamp(start, tz=timezone.utc).strftime(date_fmt) for start in starts],
+            "timestamps": [_wall_clock_epoch(start) for start in starts],
+            "values": values,
         }
     except Exception:
-        return {"dates": [], "values": []}
+        return empty
 
 
 def _format_pubdate(pubdate: str):
@@ -448,26 +1876,40 @@ def _format_pubdate(pubdate: str):
         return pubdate
 
 
-def _ensure_today_tail(dates, series_list, date_fmt, max_points=None):
+def _epoch_seconds(index):
+    # Saat dilimsiz indeksler UTC kabul edilir; istemci yalnızca sıralama/karşılaştırma için kullanır
+    return index.as_unit("s").asi8.tolist()
+
+
+def _ensure_today_tail(dates, series_list, date_fmt, max_points=None, timestamps=None, local_epoch=False):
+    # Günlük barların zaman damgası tarihin UTC gece yarısıdır;
+    # local_epoch verilirse (arbitraj kovaları) yerel gece yarısının gerçek epoch'u eklenir
     if not dates:
         return
-    today_label = datetime.now().strftime(date_fmt)
+    today = datetime.now()
+    today_label = today.strftime(date_fmt)
     if dates[-1] != today_label:
         dates.append(today_label)
         for series in series_list:
             if series:
                 series.append(series[-1])
+        if timestamps is not None:
+            midnight = today.replace(hour=0, minute=0, second=0, microsecond=0)
+            if not local_epoch:
+                midnight = midnight.replace(tzinfo=timezone.utc)
+            timestamps.append(int(midnight.timestamp()))
     if max_points and len(dates) > max_points:
         keep = max_points
         del dates[:-keep]
-        for series in series_list:
+        for series in series_list + [timestamps]:
             if series and len(series) > keep:
                 del series[:-keep]
 
 
 def _fetch_google_news(query: str, hl: str, gl: str, ceid: str, limit: int = 6):
     url = (
-        "https://news.google.com/rss/search?q="
+        NEWS_BASE_URL
+        + "/rss/search?q="
         + quote_plus(query)
         + f"&hl={hl}&gl={gl}&ceid={ceid}"
     )
@@ -478,9 +1920,7 @@ def _fetch_google_news(query: str, hl: str, gl: str, ceid: str, limit: int = 6):
             "Chrome/122.0.0.0 Safari/537.36"
         )
     }
-    res = requests.get(url, headers=headers, timeout=8)
-    res.raise_for_status()
-    root = ET.fromstring(res.text)
+    root = ET.fromstring(http_get(url, headers=headers, timeout=8, conditional=True, breaker="news"))
     channel = root.find("channel")
     items = []
     if channel is None:
@@ -501,6 +1941,19 @@ def _fetch_google_news(query: str, hl: str, gl: str, ceid: str, limit: int = 6):
     return items
 
 
+def _request_translation(text: str):
+    url = TRANSLATE_URL
+    params = {
+        "client": "gtx",
+        "sl": "auto",
+        "tl": "tr",
+        "dt": "t",
+        "q": text,
+    }
+    payload = json.loads(http_get(url, params=params, timeout=6, breaker="translate"))
+    return "".join([seg[0] for seg in payload[0] if seg and seg[0]]) if payload else ""
+
+
 def _translate_to_tr(text: str):
     if not text:
         return ""
@@ -508,30 +1961,50 @@ def _translate_to_tr(text: str):
     if cached is not None:
         return cached
     try:
-        url = "https://translate.googleapis.com/translate_a/single"
-        params = {
-            "client": "gtx",
-            "sl": "auto",
-            "tl": "tr",
-            "dt": "t",
-            "q": text,
-        }
-        res = requests.get(url, params=params, timeout=6)
-        res.raise_for_status()
-        payload = res.json()
-        translated = "".join([seg[0] for seg in payload[0]]) if payload else ""
-        TRANSLATE_CACHE[text] = translated
-        return translated
+        translated = _request_translation(text)
     except Exception:
-        TRANSLATE_CACHE[text] = ""
-        return ""
+        translated = ""
+    TRANSLATE_CACHE.put(text, translated)
+    return translated
 
 
-def get_news_data():
-    now = int(time.time())
-    if now - NEWS_CACHE["timestamp"] < NEWS_TTL_SECONDS:
-        return NEWS_CACHE["data"]
+def _translate_batch_to_tr(texts):
+    """
+    Önbellekte olmayan başlıkları satır satır birleştirip tek istekte çevirir.
+    Satır sayısı tutmazsa başlıklar tek tek çevrilir.
+    """
+    results = {}
+    missing = []
+    for text in texts:
+        if not text or text in results:
+            continue
+        cached = TRANSLATE_CACHE.get(text)
+        if cached is None:
+            missing.append(text)
+            results[text] = ""
+        else:
+            results[text] = cached
+    if not missing:
+        return results
+
+    lines = None
+    try:
+        joined = "\n".join(t.replace("\n", " ") for t in missing)
+        lines = [line.strip() for line in _request_translation(joined).split("\n")]
+    except Exception:
+        lines = None
+    if lines is not None and len(lines) == len(missing):
+        for text, translated in zip(missing, lines):
+            TRANSLATE_CACHE.put(text, translated)
+            results[text] = translated
+    else:
+        for text in missing:
+            results[text] = _translate_to_tr(text)
+    TRANSLATE_CACHE.save()
+    return results
 
+
+def _fetch_news_data(previous=None):
     data = {"status": "live", "national": [], "international": [], "updated_at": None}
     try:
         data["national"] = _fetch_google_news(
@@ -548,77 +2021,561 @@ def get_news_data():
             "US:en",
             limit=6,
         )
+        translations = _translate_batch_to_tr([item.get("title", "") for item in data["international"]])
         for item in data["international"]:
-            tr_title = _translate_to_tr(item.get("title", ""))
+            tr_title = translations.get(item.get("title", ""), "")
             if tr_title and tr_title != item.get("title"):
                 item["title_tr"] = tr_title
         data["updated_at"] = time.strftime("%H:%M:%S")
     except Exception:
-        data = NEWS_CACHE["data"]
+        data = previous or {"status": "offline", "national": [], "international": [], "updated_at": None}
         data["status"] = "offline"
+    return data
 
-    NEWS_CACHE["timestamp"] = now
-    NEWS_CACHE["data"] = data
+
+def refresh_news_snapshot():
+    previous, _ = SNAPSHOT_STORE.get("news")
+    with TIMINGS.span("refresh.news"):
+        data = _fetch_news_data(previous)
+    SNAPSHOT_STORE.put("news", data)
     return data
 
 
-@app.route("/api/metrics")
-def metrics():
-    local = get_local_gold_data()
-    log_arbitrage(local)
-    range_key = request.args.get("range", "daily")
-    preset_key = "monthly" if range_key == "yearly" else range_key
-    preset = HISTORY_PRESETS.get(preset_key, HISTORY_PRESETS["daily"])
-    global_data = get_global_data(range_key=range_key)
-    hist = global_data.get("history", {})
+def _news_due(data, ts: float, now: float):
+    ttl = NEWS_TTL_SECONDS if data and data.get("status") == "live" else NEWS_RETRY_SECONDS
+    return data is None or now - ts >= ttl
+
+
+def get_news_data():
+    """
+    Haberleri paylaşılan snapshot deposundan okur; çağıran hiçbir zaman upstream'i beklemez.
+    Süresi dolmuşsa eski kopya döner ve yenileme arka planda tek seferlik başlatılır.
+    Depo boşken dönen "loading" yer tutucusu depoya yazılmaz; istemci kısa süre sonra yeniden sorar.
+    """
+    data, ts = SNAPSHOT_STORE.get("news")
+    if _news_due(data, ts, time.time()):
+        refresh_in_background("news", refresh_news_snapshot)
+    if data is None:
+        return {"status": "loading", "national": [], "international": [], "updated_at": None}
+    return data
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def refresh_in_background(key: str, refresh):
+    """
+    Aynı anahtar için aynı anda yalnızca bir yenileme çalıştırır (single-flight).
+    Süreç içinde bayrakla, worker'lar arasında snapshot deposundaki lease ile korunur.
+    """
+    with _INFLIGHT_LOCK:
+        if key in _INFLIGHT:
+            return False
+        _INFLIGHT.add(key)
+
+    def run():
+        try:
+            if SNAPSHOT_STORE.acquire_lease(f"refresh:{key}", _worker_id(), REFRESH_LEASE_SECONDS):
+                refresh()
+        except Exception:
+            pass
+        finally:
+            with _INFLIGHT_LOCK:
+                _INFLIGHT.discard(key)
+
+    threading.Thread(target=run, name=f"refresh-{key}", daemon=True).start()
+    return True
+
+
+def _local_tick(local):
+    return {
+        "ts": int(local.get("quoted_at") or time.time()),
+        "garanti_alis": local.get("garanti", {}).get("alis", 0) or 0,
+        "garanti_satis": local.get("garanti", {}).get("satis", 0) or 0,
+        "piyasa_alis": local.get("piyasa", {}).get("alis", 0) or 0,
+        "piyasa_satis": local.get("piyasa", {}).get("satis", 0) or 0,
+    }
+
+
+def _global_tick(global_data):
+    ons = global_data.get("ONS", {}).get("price")
+    usdtry = global_data.get("USDTRY", {}).get("price")
+    if not ons or not usdtry:
+        return None
+    return {"ts": int(time.time()), "ons": ons, "usdtry": usdtry}
+
+
+def _metrics_sink(source, tick, derived):
+    SNAPSHOT_STORE.put("metrics", derived)
+
+
+def _arbitrage_sink(source, tick, derived):
+    if source == "local":
+        log_arbitrage(tick)
+
+
+def _alert_log_sink(alerts):
+    ALERT_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with ALERT_LOG_PATH.open("a", encoding="utf-8") as f:
+        for alert in alerts:
+            f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+            app.logger.warning("Alarm %s: %s=%s (seviye %s)", alert["rule"], alert["metric"], alert["value"], alert["level"])
+    recent, _ = SNAPSHOT_STORE.get("alerts")
+    SNAPSHOT_STORE.put("alerts", ((recent or []) + alerts)[-ALERT_RECENT_SIZE:])
+
+
+def _post_alerts(alerts):
+    HTTP_SESSION.post(ALERT_WEBHOOK_URL, json={"alerts": alerts}, timeout=5)
+
+
+def _alert_webhook_sink(alerts):
+    # Teslimat tick hattını bekletmez
+    HTTP_POOL.submit(_post_alerts, alerts)
+
+
+def _make_alert_engine():
+    sinks = [_alert_log_sink]
+    if ALERT_WEBHOOK_URL:
+        sinks.append(_alert_webhook_sink)
+    return AlertEngine(load_alert_rules(ALERT_RULES_PATH), sinks)
+
+
+ALERT_ENGINE = _make_alert_engine()
+
+
+def _alert_sink(source, tick, derived):
+    values = dict(tick)
+    values.update(derived)
+    ALERT_ENGINE.evaluate(tick["ts"], values)
+
+
+TICK_PIPELINE = TickPipeline(_make_operators(), sinks=[_arbitrage_sink, _metrics_sink, _alert_sink])
+
+
+def get_derived_metrics(local):
+    """
+    Tick hattının son türetilmiş metriklerini döndürür.
+    Depo henüz boşsa yerel fiyat sink'siz, geçici bir hattan geçirilir.
+    """
+    data, _ = SNAPSHOT_STORE.get("metrics")
+    if data is None:
+        data = TickPipeline(_make_operators()).push("local", _local_tick(local))
+    return data
+
+
+def _history_key(range_key: str):
+    return range_key if range_key in HISTORY_PRESETS else "daily"
+
+
+def refresh_local_snapshot():
+    with TIMINGS.span("refresh.local"):
+        data = get_local_gold_data()
+    if data.get("status") != "live":
+        # Upstream yoksa sahte fiyat yerine son iyi fiyat, yaşıyla birlikte sunulur
+        previous, _ = SNAPSHOT_STORE.get("local")
+        if previous and previous.get("quoted_at"):
+            data = dict(previous)
+            data["status"] = "stale"
+    SNAPSHOT_STORE.put("local", data)
+    return data
+
+
+def refresh_global_snapshots():
+    """
+    Tüm aralıkları tek çekimden üretip depoya yazar.
+    Geçmişi boş gelen aralıkta önceki snapshot korunur.
+    """
+    snapshots = {}
+    with TIMINGS.span("refresh.global"):
+        histories = get_global_histories()
+    for range_key, data in histories.items():
+        key = f"global:{range_key}"
+        if not data["history"]["dates"]:
+            previous, _ = SNAPSHOT_STORE.get(key)
+            if previous and previous.get("history", {}).get("dates"):
+                snapshots[range_key] = previous
+                continue
+        SNAPSHOT_STORE.put(key, data)
+        snapshots[range_key] = data
+    return snapshots
+
+
+def _refresh_as_leader():
+    local = refresh_local_snapshot()
+    if local.get("status") == "live":
+        TICK_PIPELINE.push("local", _local_tick(local))
+    now = time.time()
+    if _news_due(*SNAPSHOT_STORE.get("news"), now):
+        refresh_in_background("news", refresh_news_snapshot)
+    if now - SNAPSHOT_STORE.timestamp("archive") >= ARCHIVE_REFRESH_SECONDS:
+        refresh_in_background("archive", backfill_archive)
+    if any(
+        now - SNAPSHOT_STORE.timestamp(f"global:{range_key}") >= GLOBAL_REFRESH_SECONDS
+        for range_key in HISTORY_PRESETS
+    ):
+        tick = _global_tick(refresh_global_snapshots()["daily"])
+        if tick:
+            TICK_PIPELINE.push("global", tick)
+
+
+def _publish_changes():
+    """
+    Depodaki değişiklikleri bu worker'ın SSE aboneleri için yayınlar.
+    Lease sahibi olmayan worker'lar da aynı depoyu izlediği için her worker kendi abonelerini besler.
+    """
+    quote_ts = (SNAPSHOT_STORE.timestamp("local"), SNAPSHOT_STORE.timestamp("metrics"))
+    if quote_ts[0] and quote_ts != _STREAM_SEEN.get("local"):
+        _STREAM_SEEN["local"] = quote_ts
+        local = get_local_snapshot()
+        STREAM_HUB.publish("quote", {"local": local, "analysis": get_derived_metrics(local)})
+
+    news_ts = SNAPSHOT_STORE.timestamp("news")
+    if news_ts and news_ts != _STREAM_SEEN.get("news"):
+        _STREAM_SEEN["news"] = news_ts
+        data, _ = SNAPSHOT_STORE.get("news")
+        STREAM_HUB.publish("news", data)
+
+    changed = []
+    for range_key in HISTORY_PRESETS:
+        key = f"global:{range_key}"
+        ts = SNAPSHOT_STORE.timestamp(key)
+        if ts and ts != _STREAM_SEEN.get(key):
+            _STREAM_SEEN[key] = ts
+            changed.append(range_key)
+    arb_version = _arbitrage_version()
+    if arb_version != _STREAM_SEEN.get("arbitrage"):
+        _STREAM_SEEN["arbitrage"] = arb_version
+        changed = list(HISTORY_PRESETS)
+    if changed:
+        STREAM_HUB.publish("history", {"ranges": changed})
+
+
+def _quote_poller_loop():
+    worker_id = _worker_id()
+    next_refresh = 0.0
+    while True:
+        try:
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + LOCAL_REFRESH_SECONDS
+                if SNAPSHOT_STORE.acquire_lease(LEASE_NAME, worker_id, LEASE_TTL_SECONDS):
+                    _refresh_as_leader()
+            _publish_changes()
+        except Exception:
+            pass
+        time.sleep(STREAM_CHECK_SECONDS)
+
+
+def start_quote_poller():
+    """
+    Fiyat, geçmiş ve haber verisini yenileyen arka plan iş parçacığını başlatır.
+    Her worker bir poller çalıştırır; yalnızca lease sahibi olan upstream'e gider.
+    """
+    global _POLLER_THREAD
+    with _POLLER_LOCK:
+        if _POLLER_THREAD is not None and _POLLER_THREAD.is_alive():
+            return
+        _POLLER_THREAD = threading.Thread(target=_quote_poller_loop, name="quote-poller", daemon=True)
+        _POLLER_THREAD.start()
+
+
+def get_local_snapshot():
+    """
+    Paylaşılan depodaki son fiyat verisini döndürür; ağ çağrısı yapmaz.
+    Depo boşsa yalnızca ilk istek, ilk çekim bitene kadar kısa süre bekler.
+    """
+    start_quote_poller()
+    data, ts = SNAPSHOT_STORE.get("local")
+    deadline = time.monotonic() + LOCAL_FIRST_WAIT_SECONDS
+    while data is None and time.monotonic() < deadline:
+        time.sleep(0.2)
+        data, ts = SNAPSHOT_STORE.get("local")
+    if data is None:
+        data = _offline_local_data()
+    local = dict(data)
+    now = time.time()
+    quoted_at = local.pop("quoted_at", None)
+    local["updated_at"] = time.strftime("%H:%M:%S", time.localtime(ts)) if ts else None
+    local["stale"] = not ts or now - ts > LOCAL_STALE_SECONDS or local.get("status") == "stale"
+    local["age_seconds"] = int(now - quoted_at) if quoted_at else None
+    return local
+
+
+def get_global_snapshot(range_key: str):
+    """
+    Seçilen aralığın ONS/USDTRY/US10Y verisini paylaşılan depodan okur.
+    Depo boşsa veriyi bu istek içinde hesaplayıp depoya yazar; aynı anda gelen
+    soğuk istekler tek hesaplamayı bekler.
+    """
+    range_key = _history_key(range_key)
+    key = f"global:{range_key}"
+    data, _ = SNAPSHOT_STORE.get(key)
+    if data is None:
+        with _GLOBAL_COLD_LOCK:
+            data, _ = SNAPSHOT_STORE.get(key)
+            if data is None:
+                return refresh_global_snapshots()[range_key]
+    return data
+
+
+def _arbitrage_version():
+    return _get_last_arbitrage_ts()
+
+
+def _metrics_version(range_key: str):
+    local_ts = SNAPSHOT_STORE.timestamp("local")
+    return (
+        local_ts,
+        SNAPSHOT_STORE.timestamp("metrics"),
+        time.time() - local_ts > LOCAL_STALE_SECONDS,
+        SNAPSHOT_STORE.timestamp(f"global:{_history_key(range_key)}"),
+        _arbitrage_version(),
+        datetime.now().strftime("%Y-%m-%d"),
+    )
+
+
+def get_metrics_response(range_key: str, since=None, compact: bool = False):
+    """
+    Aralığın JSON gövdesini ve ETag'ini döndürür.
+    Gövde, veri sürümü değişmedikçe yeniden üretilmez.
+    since verilirse geçmiş serileri yalnızca o zamandan itibaren gönderilir.
+    compact verilirse gövde encode_compact ile sütun bazlı ikili biçimdedir.
+    """
+    version = _metrics_version(range_key)
+    cached = _RESPONSE_CACHE.get(range_key)
+    if cached is None or cached[0] != version:
+        # Soğuk başlangıçta snapshot'lar upstream'i bekleyebilir; bu bekleme kilidin dışında
+        # yapılır ki yavaş bir kaynak diğer aralıkların önbellekli yanıtlarını tutmasın
+        local = get_local_snapshot()
+        global_data = get_global_snapshot(range_key)
+        with _RESPONSE_LOCK:
+            cached = _RESPONSE_CACHE.get(range_key)
+            if cached is None or cached[0] != version:
+                with TIMINGS.span("metrics.build", range=range_key):
+                    payload = build_metrics_payload(range_key, local, global_data)
+                with TIMINGS.span("metrics.serialize", range=range_key):
+                    body = run_off_loop(app.json.dumps, payload).encode("utf-8")
+                cached = (version, body, hashlib.sha1(body).hexdigest(), payload)
+                _RESPONSE_CACHE[range_key] = cached
+    date_fmt = HISTORY_PRESETS[_history_key(range_key)]["date_fmt"]
+    if since is None:
+        if not compact:
+            return cached[1], cached[2]
+        packed = _COMPACT_CACHE.get(range_key)
+        if packed is None or packed[0] != cached[0]:
+            with TIMINGS.span("metrics.serialize", range=range_key, format="compact"):
+                body = run_off_loop(encode_compact, cached[3], date_fmt)
+            packed = (cached[0], body, hashlib.sha1(body).hexdigest())
+            _COMPACT_CACHE[range_key] = packed
+        return packed[1], packed[2]
+    payload = dict(cached[3])
+    payload["global"] = dict(payload["global"])
+    payload["global"]["history"] = _history_delta(payload["global"].get("history", {}), since)
+    with TIMINGS.span("metrics.serialize", range=range_key, format="compact" if compact else "json", delta="1"):
+        if compact:
+            body = run_off_loop(encode_compact, payload, date_fmt)
+        else:
+            body = run_off_loop(app.json.dumps, payload).encode("utf-8")
+    return body, hashlib.sha1(body).hexdigest()
+
+
+def _history_delta(history: dict, since: int):
+    """
+    Geçmiş serilerinden since ve sonrasındaki noktaları döndürür.
+    window_start, istemcinin pencereden düşen eski noktaları atması içindir.
+    """
+    delta = dict(history)
+    for prefix, ts_key, keys in HISTORY_TIMELINES:
+        timestamps = history.get(ts_key) or []
+        if not timestamps:
+            delta[f"{prefix}delta"] = False
+            continue
+        start = bisect_left(timestamps, since)
+        for key in keys:
+            values = history.get(key) or []
+            if len(values) == len(timestamps):
+                delta[key] = values[start:]
+        delta[f"{prefix}delta"] = True
+        delta[f"{prefix}window_start"] = timestamps[0]
+    return delta
+
+
+def _utc_labels(timestamps, date_fmt: str):
+    return [datetime.fromtimestamp(ts, tz=timezone.utc).strftime(date_fmt) for ts in timestamps]
+
+
+def _label_offset(timestamps, dates, date_fmt: str):
+    # Etiketler UTC'de ya da yerel saat ofsetiyle (arbitraj kovaları) türetilebiliyorsa ofseti döndürür
+    for offset in dict.fromkeys((0, _local_wall_clock(timestamps[-1]) - timestamps[-1])):
+        if _utc_labels([ts + offset for ts in timestamps], date_fmt) == list(dates):
+            return offset
+    return None
+
+
+def _compact_timeline(ts_key: str, timestamps, dates, date_fmt: str, columns: list):
+    """
+    Zaman eksenini özetler: düzenli adımlıysa yalnızca başlangıç ve adım, değilse
+    başlangıca göre Int32 farklar gönderilir. Etiketler zaman damgasından UTC'de
+    (gerekirse sabit bir label_offset ile) türetilebiliyorsa hiç gönderilmez;
+    aksi halde olduğu gibi başlığa yazılır.
+    """
+    timeline = {"count": len(timestamps)}
+    if not timestamps:
+        # Soğuk açılış, Yahoo kesintisi ya da yeni nokta içermeyen since yanıtı: etiket listesi boş gider
+        timeline["dates"] = list(dates)
+        return timeline
+    ts = np.asarray(timestamps, dtype=np.int64)
+    steps = np.diff(ts)
+    timeline["base"] = int(ts[0])
+    if not steps.size or np.all(steps == steps[0]):
+        timeline["step"] = int(steps[0]) if steps.size else 0
+    else:
+        columns.append({"name": ts_key, "type": "i4", "data": (ts - ts[0]).astype("<i4")})
+    fields = set(re.findall(r"%(.)", date_fmt))
+    label_offset = _label_offset(timestamps, dates, date_fmt) if dates and fields <= COMPACT_DATE_FIELDS else None
+    if label_offset is None:
+        timeline["dates"] = list(dates)
+        return timeline
+    timeline["date_fmt"] = date_fmt
+    if label_offset:
+        timeline["label_offset"] = label_offset
+    return timeline
+
+
+def _compact_values(values, digits: int):
+    # Float32, JSON'daki yuvarlanmış değeri geri veremiyorsa sütun Float64 gönderilir
+    exact = np.asarray(values, dtype=np.float64)
+    packed = exact.astype("<f4")
+    if np.array_equal(np.round(packed.astype(np.float64), digits), exact, equal_nan=True):
+        return "f4", packed
+    return "f8", exact.astype("<f8")
+
+
+def encode_compact(payload: dict, date_fmt: str):
+    """
+    Metrik yanıtını sütun bazlı ikili biçime çevirir:
+    "GIC1" | uint32 başlık uzunluğu | JSON başlık | 8 bayta hizalı sütunlar (little-endian).
+    Başlık, geçmiş dışındaki alanları JSON'daki haliyle taşır; geçmiş serileri
+    yerine zaman ekseni özetleri ve sütun tanımları yazılır.
+    """
+    history = payload["global"].get("history", {})
+    columns = []
+    series_keys = {key for _, _, keys in HISTORY_TIMELINES for key in keys}
+    meta = {key: value for key, value in history.items() if key not in series_keys}
+    timelines = {}
+    for prefix, ts_key, keys in HISTORY_TIMELINES:
+        dates_key = f"{prefix}dates"
+        timelines[ts_key] = _compact_timeline(
+            ts_key, history.get(ts_key) or [], history.get(dates_key) or [], date_fmt, columns
+        )
+        for key in keys:
+            if key in COMPACT_DIGITS and key in history:
+                digits = COMPACT_DIGITS[key]
+                dtype, data = _compact_values(history[key], digits)
+                columns.append({"name": key, "type": dtype, "data": data, "digits": digits})
+
+    offset = 0
+    blobs = []
+    for column in columns:
+        data = column.pop("data")
+        raw = data.tobytes()
+        column.update({"offset": offset, "count": len(data)})
+        padding = -len(raw) % 8
+        blobs.append(raw + b"\0" * padding)
+        offset += len(raw) + padding
+    meta["timelines"] = timelines
+    meta["columns"] = columns
+
+    header_payload = dict(payload)
+    header_payload["global"] = dict(payload["global"])
+    header_payload["global"]["history"] = meta
+    header = app.json.dumps(header_payload).encode("utf-8")
+    # Sütunlar typed array olarak doğrudan okunabilsin diye veri bölümü 8 bayta hizalanır
+    header += b" " * (-(len(COMPACT_MAGIC) + 4 + len(header)) % 8)
+    return COMPACT_MAGIC + len(header).to_bytes(4, "little") + header + b"".join(blobs)
+
+
+def build_metrics_payload(range_key: str, local=None, global_data=None):
+    if local is None:
+        local = get_local_snapshot()
+    if global_data is None:
+        global_data = get_global_snapshot(range_key)
+    analysis = get_derived_metrics(local)
+    preset = HISTORY_PRESETS.get(range_key, HISTORY_PRESETS["daily"])
+    # Depodaki snapshot tüm aralıklarca paylaşılır; arbitraj sütunları kopyaya yazılır
+    global_data = dict(global_data)
+    hist = dict(global_data.get("history", {}))
+    global_data["history"] = hist
+    # Rollup kovaları gerçek epoch taşır; ana eksenden kopyalanan arbitraj ekseni ana eksenin kuralını izler
+    arbitrage_epoch = False
     if hist.get("dates"):
         arb_hist = get_arbitrage_history(range_key)
         if arb_hist["dates"]:
             hist["arbitrage_dates"] = arb_hist["dates"]
+            hist["arbitrage_timestamps"] = arb_hist["timestamps"]
             hist["arbitrage_prices"] = arb_hist["values"]
+            arbitrage_epoch = True
         else:
-            arb_val = round(
-                (local.get("piyasa", {}).get("satis", 0) or 0)
-                - (local.get("garanti", {}).get("alis", 0) or 0),
-                2,
-            )
-            hist["arbitrage_dates"] = hist["dates"]
+            arb_val = analysis.get("arbitrage", 0)
+            hist["arbitrage_dates"] = list(hist["dates"])
+            hist["arbitrage_timestamps"] = list(hist.get("timestamps", []))
             hist["arbitrage_prices"] = [arb_val for _ in hist["dates"]]
 
         # Saatlikte tek nokta gelirse grafiği doldurmak için hizala
         if range_key == "hourly" and hist.get("dates"):
             if len(hist["arbitrage_dates"]) < len(hist["dates"]):
                 last_val = hist["arbitrage_prices"][-1] if hist["arbitrage_prices"] else 0
-                hist["arbitrage_dates"] = hist["dates"]
+                hist["arbitrage_dates"] = list(hist["dates"])
+                hist["arbitrage_timestamps"] = list(hist.get("timestamps", []))
                 hist["arbitrage_prices"] = [last_val for _ in hist["dates"]]
+                arbitrage_epoch = False
     if hist.get("arbitrage_dates") and hist.get("arbitrage_prices") and range_key not in {"hourly", "daily"}:
         _ensure_today_tail(
             hist["arbitrage_dates"],
             [hist["arbitrage_prices"]],
             preset["date_fmt"],
             preset.get("max_points"),
+            hist.get("arbitrage_timestamps"),
+            local_epoch=arbitrage_epoch,
         )
 
-    garanti_alis = local.get("garanti", {}).get("alis", 0) or 0
-    garanti_satis = local.get("garanti", {}).get("satis", 0) or 0
-    spread = garanti_satis - garanti_alis
-    spread_pct = (spread / garanti_alis) * 100 if garanti_alis else 0
-
-    if spread_pct > 1.5:
-        signal = "BEKLE (Yüksek Makas)"
-    else:
-        signal = "İŞLEM UYGUN"
-
-    response = {
+    return {
         "local": local,
         "global": global_data,
-        "analysis": {
-            "spread_tl": round(spread, 2),
-            "spread_pct": round(spread_pct, 2),
-            "signal": signal,
-        },
+        "analysis": analysis,
     }
-    return jsonify(response)
+
+
+def _wants_compact():
+    if request.args.get("format") == "compact":
+        return True
+    # Tarayıcıların varsayılan */* başlığı JSON'da kalır; ikili biçim yalnızca açıkça istenirse seçilir
+    return request.accept_mimetypes.best_match(["application/json", COMPACT_MEDIA_TYPE]) == COMPACT_MEDIA_TYPE
+
+
+@app.route("/api/metrics")
+def metrics():
+    start_quote_poller()
+    range_key = request.args.get("range", "daily")
+    if range_key not in HISTORY_PRESETS:
+        range_key = "daily"
+    since = request.args.get("since", type=int)
+    compact = _wants_compact()
+    body, etag = get_metrics_response(range_key, since, compact)
+    response = Response(body, mimetype=COMPACT_MEDIA_TYPE if compact else "application/json")
+    # Aynı URL Accept'e göre JSON ya da compact döner; ara önbellekler iki biçimi karıştırmasın
+    response.vary.add("Accept")
+    if compact:
+        response.vary.add("Accept-Encoding")
+        if request.accept_encodings["gzip"]:
+            etag += "-gz"
+            response.headers["Content-Encoding"] = "gzip"
+            # 304 dönecekse gövde hiç sıkıştırılmaz
+            if not request.if_none_match.contains(etag):
+                response.set_data(gzip.compress(body, COMPACT_GZIP_LEVEL))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 
 @app.route("/api/news")
@@ -626,6 +2583,173 @@ def news():
     return jsonify(get_news_data())
 
 
+def _history_body(args):
+    return app.json.dumps(get_history_response(args)).encode("utf-8")
+
+
+@app.route("/api/history")
+def history():
+    body = run_off_loop(_history_body, request.args.copy())
+    response = Response(body, mimetype="application/json")
+    response.set_etag(hashlib.sha1(body).hexdigest())
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@app.cli.command("backfill")
+def backfill_command():
+    """Uzun vadeli arşivi doldurur: QUOTE_POLLER=0 flask --app app backfill"""
+    for key, count in backfill_archive().items():
+        click.echo(f"{key}: {count} bar")
+
+
+@app.route("/api/quotes")
+def quotes():
+    start_quote_poller()
+    return jsonify(get_quote_matrix())
+
+
+@app.route("/api/alerts")
+def alerts():
+    data, _ = SNAPSHOT_STORE.get("alerts")
+    return jsonify({"rules": ALERT_ENGINE.rule_count, "alerts": data or []})
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_timing(response):
+    started = getattr(g, "request_started", None)
+    if started is not None:
+        # Etiket olarak URL değil kural kullanılır; bilinmeyen yollar tek seride toplanır
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        TIMINGS.observe("request", (time.perf_counter() - started) * 1000, {"route": route, "status": response.status_code})
+    return response
+
+
+# Hata ayıklama uçları yalnızca yerelden açıktır; DEBUG_ENDPOINTS=1 herkese açar
+DEBUG_ENDPOINTS = os.environ.get("DEBUG_ENDPOINTS", "0") == "1"
+LOOPBACK_ADDRS = {"127.0.0.1", "::1"}
+
+
+def _require_debug_access():
+    if not DEBUG_ENDPOINTS and request.remote_addr not in LOOPBACK_ADDRS:
+        abort(404)
+
+
+@app.route("/api/debug/timings")
+def debug_timings():
+    _require_debug_access()
+    if request.args.get("format") == "prometheus":
+        return Response(TIMINGS.prometheus(), mimetype="text/plain; version=0.0.4")
+    return jsonify({"pid": os.getpid(), "spans": TIMINGS.snapshot()})
+
+
+@app.route("/api/debug/http")
+def debug_http():
+    _require_debug_access()
+    return jsonify(
+        {
+            "pools": http_pool_stats(),
+            "breakers": {name: breaker.snapshot() for name, breaker in BREAKERS.items()},
+        }
+    )
+
+
+def _sse(seq: int, event: str, payload: str):
+    return f"id: {seq}\nevent: {event}\ndata: {payload}\n\n"
+
+
+@app.route("/api/stream")
+def stream():
+    """
+    Fiyat, geçmiş ve haber değişikliklerini Server-Sent Events ile iter.
+    Bağlanan istemci önce her olay türünün son halini alır.
+    """
+    start_quote_poller()
+
+    def generate():
+        latest, seq = STREAM_HUB.latest()
+        for item in latest:
+            yield _sse(*item)
+        while True:
+            events, seq = STREAM_HUB.wait(seq, STREAM_HEARTBEAT_SECONDS)
+            if not events:
+                yield ": ping\n\n"
+                continue
+            for item in events:
+                yield _sse(*item)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _warm_snapshot_keys():
+    return list(WARM_SNAPSHOT_KEYS) + [f"global:{range_key}" for range_key in HISTORY_PRESETS]
+
+
+def save_warm_snapshot():
+    """
+    Depodaki son snapshot'ları zaman damgalarıyla birlikte diske yazar.
+    Birden çok worker aynı dosyayı yazabileceği için yazım geçici dosya üzerinden yapılır.
+    """
+    items = {}
+    for key in _warm_snapshot_keys():
+        try:
+            value, ts = SNAPSHOT_STORE.get(key)
+        except Exception:
+            continue
+        if value is not None:
+            items[key] = {"value": value, "updated_at": ts}
+    if not items:
+        return
+    try:
+        WARM_SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = WARM_SNAPSHOT_PATH.with_name(f"{WARM_SNAPSHOT_PATH.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, WARM_SNAPSHOT_PATH)
+    except Exception:
+        pass
+
+
+def load_warm_snapshot():
+    """
+    Kapanışta yazılan snapshot'ları depoda daha yenisi yoksa geri yükler.
+    Orijinal zaman damgaları korunur; poller bunları eski görüp arka planda yeniler,
+    bu arada ilk istekler upstream'i beklemeden son bilinen veriyle yanıtlanır.
+    """
+    try:
+        items = json.loads(WARM_SNAPSHOT_PATH.read_text(encoding="utf-8"))
+    except Exception:
+        return 0
+    loaded = 0
+    for key in _warm_snapshot_keys():
+        item = items.get(key)
+        if not isinstance(item, dict) or item.get("value") is None:
+            continue
+        try:
+            if SNAPSHOT_STORE.timestamp(key) < item.get("updated_at", 0):
+                SNAPSHOT_STORE.put(key, item["value"], updated_at=item["updated_at"])
+                loaded += 1
+        except Exception:
+            pass
+    return loaded
+
+
+atexit.register(flush_arbitrage_ticks)
+atexit.register(save_warm_snapshot)
+load_warm_snapshot()
+
+# Fiyat örneklemesi trafiğe bağlı olmasın diye poller modül yüklenirken başlar
+if os.environ.get("QUOTE_POLLER", "1") != "0":
+    start_quote_poller()
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,310 @@
+"""
+Uçtan uca bench ve yük testi.
+
+Upstream'leri bench/upstreams.py ile yerel kayıtlara yönlendirir, ardından:
+  * aşama maliyetleri: scrape, parse, yfinance, resample, serialize, compact
+  * /api/metrics ve /api/news için N eşzamanlı istemciyle p50/p99 gecikme ve throughput
+  * uzun koşuda bellek büyümesi (tracemalloc + RSS)
+ölçer ve sonuçları commit'ler arasında karşılaştırılabilsin diye JSON olarak yazar:
+
+    python bench/bench_load.py --clients 16 --duration 20 --latency-ms 50
+    python bench/compare.py bench/results/eski.json bench/results/yeni.json
+
+--server gevent, uygulamayı üretimdeki gibi (gunicorn -k gevent) yamalı bir süreçte
+gevent WSGI sunucusuyla çalıştırır.
+"""
+import sys
+
+# gevent yaması her şeyden önce uygulanmalı; argparse'tan önce argv'ye bakılır
+if "--server=gevent" in sys.argv or any(
+    arg == "--server" and value == "gevent" for arg, value in zip(sys.argv, sys.argv[1:])
+):
+    from gevent import monkey
+
+    monkey.patch_all()
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import upstreams  # noqa: E402
+
+RESULTS_DIR = BENCH_DIR / "results"
+RANGES = ["hourly", "daily", "weekly", "monthly", "yearly"]
+
+
+def _percentiles(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    ordered = sorted(samples_ms)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def _time_stage(func, repeat: int):
+    # --fail-rate altında başarısız örnekler süreye katılmaz, run_load'daki gibi hata olarak sayılır
+    samples = []
+    errors = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            errors += 1
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+    stats = _percentiles(samples)
+    stats["errors"] = errors
+    return stats
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure_stages(app, config, repeat: int):
+    url = app.QUOTE_SOURCES[0]["url"]
+    # Ölçülecek girdiler hatasız hazırlanır; --fail-rate yalnızca ölçülen örneklere uygulanır
+    fail_rate, config.fail_rate = config.fail_rate, 0.0
+    try:
+        html = app.http_get(url, headers=app.DOVIZ_HEADERS)
+        # Bar deposu kilitleri gerçek thread kilitleridir; uygulamadaki gibi yalnızca YAHOO_POOL'da alınır
+        chains = {
+            key: app.YAHOO_POOL.submit(app._fetch_close_chain, symbols, *app.HISTORY_SOURCES["intraday"])
+            for key, symbols in app.GLOBAL_TICKERS.items()
+        }
+        series_map = {key: future.result() for key, future in chains.items()}
+        series_map = {key: series for key, series in series_map.items() if series is not None}
+        payload = app.build_metrics_payload("daily")
+    finally:
+        config.fail_rate = fail_rate
+
+    def resample():
+        for preset in app.HISTORY_PRESETS.values():
+            if preset["source"] == "intraday":
+                app._build_range_data(series_map, preset)
+
+    def download():
+        app.BREAKERS["yahoo"].record_success()
+        if app.YAHOO_POOL.submit(app._download_history, "GC=F", "5m", period="2d").result() is None:
+            raise RuntimeError("yfinance çekimi başarısız")
+
+    return {
+        "scrape": _time_stage(lambda: app.http_get(url, headers=app.DOVIZ_HEADERS, conditional=True), repeat),
+        "parse": _time_stage(lambda: app._extract_bid_ask(html), repeat),
+        "yfinance": _time_stage(download, repeat),
+        "resample": _time_stage(resample, repeat),
+        "serialize": _time_stage(lambda: app.app.json.dumps(payload), repeat),
+        "compact": _time_stage(lambda: app.encode_compact(payload, app.HISTORY_PRESETS["daily"]["date_fmt"]), repeat),
+    }
+
+
+def run_load(base_url: str, clients: int, duration: float):
+    targets = [f"/api/metrics?range={key}" for key in RANGES] + ["/api/news"]
+    latencies = {"metrics": [], "news": []}
+    errors = {"metrics": 0, "news": 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset: int):
+        session = requests.Session()
+        i = offset
+        local = {"metrics": [], "news": []}
+        local_errors = {"metrics": 0, "news": 0}
+        while time.monotonic() < stop_at:
+            path = targets[i % len(targets)]
+            kind = "news" if path.startswith("/api/news") else "metrics"
+            i += 1
+            start = time.perf_counter()
+            try:
+                ok = session.get(base_url + path, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                local[kind].append((time.perf_counter() - start) * 1000)
+            else:
+                local_errors[kind] += 1
+        with lock:
+            for kind in latencies:
+                latencies[kind] += local[kind]
+                errors[kind] += local_errors[kind]
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    result = {}
+    for kind, samples in latencies.items():
+        stats = _percentiles(samples)
+        stats["errors"] = errors[kind]
+        stats["rps"] = round(len(samples) / elapsed, 1)
+        result[kind] = stats
+    return result
+
+
+def _start_app_server(wsgi_app, kind: str):
+    if kind == "gevent":
+        from gevent.pywsgi import WSGIServer
+
+        server = WSGIServer(("127.0.0.1", 0), wsgi_app, log=None)
+        server.start()
+        return server.server_port, server.stop
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, wsgi_app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return server.server_port, server.shutdown
+
+
+def _health(app):
+    # Yük altında üretilen sayılar ancak fiyatlar gerçekten çekilebildiyse anlamlıdır
+    quotes = app.get_quote_matrix()["quotes"]
+    return {
+        "local_status": app.get_local_snapshot()["status"],
+        "quote_cells": sum(cell is not None for row in quotes for cell in row),
+        "breakers_open": sorted(name for name, breaker in app.BREAKERS.items() if breaker.state != "closed"),
+    }
+
+
+def run_soak(app, cycles: int, sample_every: int):
+    tracemalloc.start()
+    samples = []
+    for cycle in range(cycles + 1):
+        if cycle % sample_every == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            samples.append({"cycle": cycle, "traced_kb": current // 1024, "rss_kb": _rss_kb()})
+        if cycle == cycles:
+            break
+        app._refresh_as_leader()
+        app._publish_changes()
+        for key in RANGES:
+            app.get_metrics_response(key)
+    tracemalloc.stop()
+    return {
+        "cycles": cycles,
+        "samples": samples,
+        "traced_growth_kb": samples[-1]["traced_kb"] - samples[1]["traced_kb"] if len(samples) > 2 else 0,
+        "rss_growth_kb": samples[-1]["rss_kb"] - samples[1]["rss_kb"] if len(samples) > 2 else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uçtan uca bench ve yük testi")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="yük testi süresi (sn)")
+    parser.add_argument("--latency-ms", type=float, default=50, help="sahte upstream gecikmesi")
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--stage-repeat", type=int, default=30)
+    parser.add_argument("--soak-cycles", type=int, default=200)
+    parser.add_argument("--backend", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--server", choices=["werkzeug", "gevent"], default="werkzeug")
+    parser.add_argument("--out", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    config = upstreams.UpstreamConfig(args.latency_ms, args.jitter_ms, args.fail_rate)
+    upstream_server, upstream_url = upstreams.start_server(config)
+    data_dir = tempfile.mkdtemp(prefix="bench-data-")
+    os.environ.update(upstreams.upstream_env(upstream_url))
+    os.environ.update({"DATA_DIR": data_dir, "QUOTE_POLLER": "0", "SNAPSHOT_BACKEND": args.backend})
+    upstreams.install_replay_ticker(config)
+
+    import app  # noqa: E402
+
+    app._refresh_as_leader()
+    app.refresh_news_snapshot()
+
+    print("Aşama maliyetleri ölçülüyor...")
+    stages = measure_stages(app, config, args.stage_repeat)
+
+    port, stop_server = _start_app_server(app.app, args.server)
+    print(f"{args.clients} istemciyle {args.duration:.0f} sn yük testi ({args.server})...")
+    load = run_load(f"http://127.0.0.1:{port}", args.clients, args.duration)
+    stop_server()
+
+    print(f"{args.soak_cycles} turluk bellek koşusu...")
+    app.BAR_MIN_REFETCH_SECONDS = 0
+    soak = run_soak(app, args.soak_cycles, max(1, args.soak_cycles // 10))
+    upstream_server.shutdown()
+    health = _health(app)
+
+    commit = _git_commit()
+    result = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "upstream": {"requests": config.requests, "failures": config.failures},
+        "stages": stages,
+        "load": load,
+        "memory": soak,
+        "health": health,
+    }
+    args.out.mkdir(parents=True, exist_ok=True)
+    path = args.out / f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    path.write_text(json.dumps(result, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    for name, stats in stages.items():
+        print(
+            f"  {name:<10} p50 {stats.get('p50', 0):8.3f} ms  p99 {stats.get('p99', 0):8.3f} ms  hata {stats['errors']}"
+        )
+    for kind, stats in load.items():
+        print(
+            f"  /api/{kind:<8} {stats['rps']:7.1f} req/s  p50 {stats.get('p50', 0):7.2f} ms  "
+            f"p99 {stats.get('p99', 0):7.2f} ms  hata {stats['errors']}"
+        )
+    print(f"  sağlık: yerel {health['local_status']}, dolu fiyat hücresi {health['quote_cells']}, "
+          f"açık devre {health['breakers_open'] or 'yok'}")
+    print(f"  bellek: tracemalloc {soak['traced_growth_kb']:+d} KB, RSS {soak['rss_growth_kb']:+d} KB")
+    print(f"Sonuç: {path}")
+
+
+if __name__ == "__main__":
+    main()
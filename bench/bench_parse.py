@@ -0,0 +1,47 @@
+"""
+doviz.com bid/ask çıkarımı için mikro benchmark.
+
+fixtures/ altındaki sayfalarda hızlı yol (regex tarama) ile tam BeautifulSoup
+ayrıştırmasını karşılaştırır. Bu sayfalar sentetiktir: doviz.com'dan kaydedilmemiş,
+bid/ask span'ları üretilmiş dolgu (preload satırları, tekrarlanan "last" span'ları)
+arasında ~27 KB'ye yerleştirilmiştir. Ölçülen hızlanma yalnızca bu düzen için geçerlidir;
+gerçek sayfada oran, sayfa boyutuna ve bid/ask'ın konumuna göre değişir.
+
+    python bench/bench_parse.py
+"""
+import os
+import sys
+import timeit
+from pathlib import Path
+
+os.environ.setdefault("QUOTE_POLLER", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+PAGES = ["doviz_garanti_gram.html", "doviz_gram_altin.html"]
+
+
+def _best_ms(func, html: str, number: int):
+    runs = timeit.repeat(lambda: func(html), number=number, repeat=5)
+    return min(runs) / number * 1000
+
+
+def main():
+    for name in PAGES:
+        html = (FIXTURES_DIR / name).read_text(encoding="utf-8")
+        fast = app._extract_bid_ask_fast(html)
+        soup = app._extract_bid_ask_soup(html)
+        if fast != soup:
+            raise SystemExit(f"{name}: hızlı yol {fast}, BeautifulSoup {soup} döndürdü")
+        fast_ms = _best_ms(app._extract_bid_ask_fast, html, 200)
+        soup_ms = _best_ms(app._extract_bid_ask_soup, html, 5)
+        print(
+            f"{name} ({len(html) // 1024} KB) bid/ask={fast}: "
+            f"fast {fast_ms:.3f} ms, soup {soup_ms:.2f} ms, x{soup_ms / fast_ms:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
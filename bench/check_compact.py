@@ -0,0 +1,147 @@
+"""
+Sütun bazlı ikili biçim (GIC1) için kodlayıcı/çözücü tutarlılık denetimi.
+
+app.encode_compact ile üretilen gövdeleri static/script.js içindeki decodeCompact
+ile (node üzerinde) çözer ve aynı yükün JSON haliyle karşılaştırır. Boş geçmiş,
+yalnızca arbitraj ekseni boş ve since ile gelen delta yanıtları da denenir:
+
+    python bench/check_compact.py
+"""
+import base64
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+os.environ.setdefault("QUOTE_POLLER", "0")
+os.environ.setdefault("SNAPSHOT_BACKEND", "memory")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="check_compact_"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app  # noqa: E402
+
+SCRIPT_PATH = Path(app.BASE_DIR) / "static" / "script.js"
+
+# script.js tarayıcı betiğidir; DOM ve ağ çağrıları her şeyi kabul eden bir vekille karşılanır
+NODE_HARNESS = r"""
+const fs = require("fs");
+const vm = require("vm");
+const [scriptPath, casesPath] = process.argv.slice(1);
+const stub = new Proxy(function () {}, {
+  get: (target, key) => (key === Symbol.toPrimitive ? () => "" : key === "then" ? undefined : stub),
+  apply: () => stub,
+  construct: () => stub,
+});
+const context = vm.createContext({
+  window: {},
+  document: stub,
+  console,
+  TextDecoder,
+  fetch: () => new Promise(() => {}),
+  setInterval: () => 0,
+  setTimeout: () => 0,
+  clearTimeout: () => {},
+});
+vm.runInContext(fs.readFileSync(scriptPath, "utf8"), context, { filename: "script.js" });
+
+const sortKeys = (value) =>
+  JSON.stringify(value, (key, v) => {
+    if (ArrayBuffer.isView(v)) return Array.from(v);
+    if (v && typeof v === "object" && !Array.isArray(v)) {
+      return Object.fromEntries(Object.entries(v).sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0)));
+    }
+    return v;
+  });
+
+let failed = 0;
+for (const item of JSON.parse(fs.readFileSync(casesPath, "utf8"))) {
+  const bytes = Buffer.from(item.body, "base64");
+  let result;
+  try {
+    const got = context.decodeCompact(bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.length));
+    result = sortKeys(got) === sortKeys(item.expected) ? "ok" : "farklı";
+  } catch (err) {
+    result = `hata: ${err.message}`;
+  }
+  if (result !== "ok") failed += 1;
+  console.log(`  ${item.name.padEnd(28)} ${result}`);
+}
+process.exit(failed ? 1 : 0);
+"""
+
+
+def _history(timestamps, arbitrage_timestamps, date_fmt):
+    def labels(values):
+        return [datetime.fromtimestamp(ts, tz=timezone.utc).strftime(date_fmt) for ts in values]
+
+    return {
+        "dates": labels(timestamps),
+        "timestamps": list(timestamps),
+        "ons_prices": [round(2650 + i * 0.37, 2) for i in range(len(timestamps))],
+        "usd_prices": [round(34.1 + i * 0.0031, 4) for i in range(len(timestamps))],
+        "us10y_prices": [round(4.2 + i * 0.01, 2) for i in range(len(timestamps))],
+        "gram_prices": [round(2900 + i * 1.13, 2) for i in range(len(timestamps))],
+        "arbitrage_dates": labels(arbitrage_timestamps),
+        "arbitrage_timestamps": list(arbitrage_timestamps),
+        "arbitrage_prices": [round(12.5 - i * 0.25, 2) for i in range(len(arbitrage_timestamps))],
+    }
+
+
+def _payload(history):
+    return {
+        "local": {
+            "garanti": {"alis": 2990.5, "satis": 3050.25},
+            "piyasa": {"alis": 3001.1, "satis": 3002.4},
+            "status": "live",
+        },
+        "analysis": {"arbitrage": 12.5},
+        "global": {"ONS": {"price": 2650.0, "change": 0.4}, "history": history},
+    }
+
+
+def build_cases():
+    date_fmt = app.HISTORY_PRESETS["daily"]["date_fmt"]
+    base = 1_760_000_000 - 1_760_000_000 % 3600
+    timestamps = [base + i * 3600 for i in range(24)]
+    arbitrage_timestamps = [base + i * 3600 for i in (0, 1, 2, 5, 8, 9, 15, 23)]
+    full = _history(timestamps, arbitrage_timestamps, date_fmt)
+    histories = {
+        "tam": full,
+        "boş geçmiş": _history([], [], date_fmt),
+        "yalnızca arbitraj boş": _history(timestamps, [], date_fmt),
+        "since delta": app._history_delta(full, timestamps[-3]),
+        "since delta, yeni nokta yok": app._history_delta(full, timestamps[-1] + 1),
+    }
+    cases = []
+    for name, history in histories.items():
+        payload = _payload(history)
+        cases.append(
+            {
+                "name": name,
+                "body": base64.b64encode(app.encode_compact(payload, date_fmt)).decode("ascii"),
+                "expected": json.loads(app.app.json.dumps(payload)),
+            }
+        )
+    return cases
+
+
+def main():
+    node = shutil.which("node")
+    if node is None:
+        raise SystemExit("node bulunamadı; decodeCompact denetimi için Node.js gerekir")
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(build_cases(), f)
+    try:
+        print("decodeCompact:")
+        result = subprocess.run([node, "-e", NODE_HARNESS, str(SCRIPT_PATH), f.name])
+    finally:
+        os.unlink(f.name)
+    sys.exit(result.returncode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+İki bench_load.py sonucunu karşılaştırır.
+
+    python bench/compare.py bench/results/eski.json bench/results/yeni.json --threshold 15
+
+p50/p99 gecikmeleri eşikten fazla kötüleşirse 1 ile çıkar.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _flatten(result: dict):
+    rows = {}
+    for name, stats in result.get("stages", {}).items():
+        for key in ("p50", "p99"):
+            rows[f"stages.{name}.{key}"] = stats.get(key)
+    for name, stats in result.get("load", {}).items():
+        for key in ("p50", "p99", "rps"):
+            rows[f"load.{name}.{key}"] = stats.get(key)
+    memory = result.get("memory", {})
+    for key in ("traced_growth_kb", "rss_growth_kb"):
+        rows[f"memory.{key}"] = memory.get(key)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bench_load.py sonuçlarını karşılaştırır")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=10, help="izin verilen kötüleşme yüzdesi")
+    args = parser.parse_args()
+
+    base = json.loads(args.baseline.read_text(encoding="utf-8"))
+    cand = json.loads(args.candidate.read_text(encoding="utf-8"))
+    print(f"{base.get('commit')} -> {cand.get('commit')}")
+    base_rows, cand_rows = _flatten(base), _flatten(cand)
+    regressions = []
+    for key in base_rows:
+        old, new = base_rows[key], cand_rows.get(key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        # rps'te düşüş, gecikmede artış kötüleşmedir
+        worse = -change if key.endswith(".rps") else change
+        mark = ""
+        if key.startswith(("stages.", "load.")) and worse > args.threshold:
+            regressions.append(key)
+            mark = "  <-- kötüleşme"
+        print(f"  {key:<28} {old:>12} {new:>12} {change:+8.1f}%{mark}")
+    if regressions:
+        print(f"{len(regressions)} metrik %{args.threshold:g} eşiğini aştı")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
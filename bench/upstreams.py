@@ -0,0 +1,211 @@
+"""
+Bench ve yük testleri için upstream yerine geçen sahte servisler.
+
+doviz.com, Google News RSS ve translate uç noktalarını fixtures/ altındaki sentetik
+yanıtlarla yerel bir HTTP sunucusundan oynatır; Yahoo Finance için yfinance.Ticker
+yerine sentetik barları oynatan ReplayTicker kurulur. Gecikme ve hata oranı ayarlanabilir.
+Fixture'ların kaynağı için fixtures/README.md'ye bakın.
+
+Tek başına da çalıştırılabilir:
+
+    python bench/upstreams.py --port 8765 --latency-ms 80 --fail-rate 0.05
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+YAHOO_DIR = FIXTURES_DIR / "yahoo"
+PERIOD_DAYS = {"1d": 1, "2d": 2, "5d": 5, "7d": 7, "1mo": 30, "3mo": 90, "1y": 365, "730d": 730, "max": 3650}
+INTERVAL_SECONDS = {"5m": 300, "1d": 86400}
+
+
+def _native_lock():
+    """gevent altında ReplayTicker gerçek thread'lerden çağrılır; yamalı kilit thread'ler arasında paylaşılamaz."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return threading.Lock()
+    if monkey.is_module_patched("threading"):
+        return monkey.get_original("_thread", "allocate_lock")()
+    return threading.Lock()
+
+
+class UpstreamConfig:
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, fail_rate: float = 0, seed: int = 1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._lock = _native_lock()
+        self.requests = 0
+        self.failures = 0
+
+    def delay_and_fail(self):
+        """Ayarlanan gecikmeyi uygular; isteğin hata ile sonuçlanıp sonuçlanmayacağını döndürür."""
+        with self._lock:
+            self.requests += 1
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+            fail = self._random.random() < self.fail_rate
+            if fail:
+                self.failures += 1
+        delay = max(0.0, self.latency_ms + jitter) / 1000
+        if delay:
+            time.sleep(delay)
+        return fail
+
+
+def _doviz_page(path: str):
+    # Banka sayfaları Garanti kaydını, piyasa sayfaları gram altın kaydını oynatır
+    name = "doviz_gram_altin.html" if path.count("/") == 1 else "doviz_garanti_gram.html"
+    return (FIXTURES_DIR / name).read_bytes(), "text/html; charset=utf-8"
+
+
+def _news_feed(query: dict):
+    lang = "tr" if query.get("hl", ["tr"])[0] == "tr" else "en"
+    return (FIXTURES_DIR / f"google_news_{lang}.xml").read_bytes(), "application/rss+xml; charset=utf-8"
+
+
+def _translation(query: dict):
+    # Gerçek uç noktanın biçimi: [[[çeviri, kaynak, ...], ...], ...]
+    text = query.get("q", [""])[0]
+    translated = "\n".join(f"[tr] {line}" for line in text.split("\n"))
+    return json.dumps([[[translated, text, None, None, 10]], None, "en"]).encode("utf-8"), "application/json"
+
+
+def make_handler(config: UpstreamConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if config.delay_and_fail():
+                return self._send(503, b"upstream failure", "text/plain")
+            if url.path.startswith("/rss/"):
+                body, content_type = _news_feed(query)
+            elif url.path.startswith("/translate_a/"):
+                body, content_type = _translation(query)
+            else:
+                body, content_type = _doviz_page(url.path)
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", content_type, etag)
+            return self._send(200, body, content_type, etag)
+
+        def _send(self, status: int, body: bytes, content_type: str, etag=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(config: UpstreamConfig, host: str = "127.0.0.1", port: int = 0):
+    """Sahte sunucuyu arka planda başlatır; (sunucu, taban adres) döndürür."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bench-upstreams", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def upstream_env(base_url: str):
+    """app modülü import edilmeden önce ortama yazılacak upstream adresleri."""
+    return {
+        "DOVIZ_BASE_URL": base_url,
+        "NEWS_BASE_URL": base_url,
+        "TRANSLATE_URL": base_url + "/translate_a/single",
+    }
+
+
+class ReplayTicker:
+    """
+    yfinance.Ticker yerine kayıtlı barları oynatır.
+    Son kayıtlı bar şimdiye kaydırılır; böylece artımlı güncellemeler ve "bugün" kuyruğu gerçekçi kalır.
+    """
+
+    config = UpstreamConfig()
+    _frames = {}
+    _frames_lock = _native_lock()
+
+    def __init__(self, symbol: str, *args, **kwargs):
+        self.symbol = symbol
+
+    @classmethod
+    def _recorded(cls, symbol: str, interval: str):
+        key = (symbol, interval)
+        with cls._frames_lock:
+            if key not in cls._frames:
+                name = "".join(ch if ch.isalnum() else "_" for ch in symbol).strip("_")
+                path = YAHOO_DIR / f"{name}_{interval}.csv"
+                cls._frames[key] = pd.read_csv(path) if path.exists() else None
+            return cls._frames[key]
+
+    def history(self, period="1mo", interval="1d", start=None, end=None, **kwargs):
+        if self.config.delay_and_fail():
+            raise ConnectionError(f"replay failure for {self.symbol}")
+        recorded = self._recorded(self.symbol, interval)
+        if recorded is None or interval not in INTERVAL_SECONDS:
+            return pd.DataFrame()
+        step = INTERVAL_SECONDS[interval]
+        ts = recorded["ts"].to_numpy(dtype="int64")
+        now = int(time.time())
+        ts = ts + (now - now % step - ts[-1])
+        if start is not None:
+            lower = int(pd.Timestamp(start).timestamp())
+        else:
+            lower = now - PERIOD_DAYS.get(period, 30) * 86400
+        keep = ts >= lower
+        index = pd.to_datetime(ts[keep], unit="s", utc=True).tz_convert("America/New_York")
+        if interval == "1d":
+            index = index.normalize()
+        frame = recorded.loc[keep, ["open", "high", "low", "close", "volume"]]
+        frame = pd.DataFrame(np.asarray(frame, dtype="float64"), index=index, columns=["Open", "High", "Low", "Close", "Volume"])
+        return frame
+
+
+def install_replay_ticker(config: UpstreamConfig):
+    import yfinance
+
+    ReplayTicker.config = config
+    yfinance.Ticker = ReplayTicker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0)
+    args = parser.parse_args()
+    config = UpstreamConfig(args.latency_ms, args.jitter_ms, args.fail_rate)
+    server, base_url = start_server(config, args.host, args.port)
+    print(f"Sahte upstream'ler {base_url} adresinde. Uygulamayı şu ortamla başlatın:")
+    for key, value in upstream_env(base_url).items():
+        print(f"  export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
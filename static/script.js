@@ -5,6 +5,15 @@ let gramChart = null;
 let arbitrageChart = null;
 let currentRange = "daily";
 let lastRenderedRange = "daily";
+let metricsEtag = null;
+let lastGlobal = null;
+let historyState = null;
+let metricsTimer = null;
+let newsTimer = null;
+let newsRetryTimer = null;
+const STREAM_MAX_FAILURES = 3;
+// Haber henüz yüklenmediyse ya da çekilemediyse 5 dk'lık turu beklemeden yeniden sorulur
+const NEWS_RETRY_MS = 15000;
 
 const CHART_PALETTE = {
   ons: { pos: "#16c784", neg: "#ef4444", neu: "#f5c451" },
@@ -183,8 +192,8 @@ function getXAxisTickOptions(labelCount) {
       font: { size: 10 },
     };
   }
-  if (currentRange === "monthly") {
-    const step = labelCount ? Math.ceil(labelCount / 10) : 1;
+  if (currentRange === "monthly" || currentRange === "yearly") {
+    const step = labelCount ? Math.ceil(labelCount / (currentRange === "yearly" ? 12 : 10)) : 1;
     return {
       ...base,
       autoSkip: false,
@@ -384,6 +393,7 @@ function rangeLabel(rangeKey) {
   if (rangeKey === "hourly") return "Saatlik";
   if (rangeKey === "weekly") return "Haftalık";
   if (rangeKey === "monthly") return "Aylık";
+  if (rangeKey === "yearly") return "Yıllık";
   return "Günlük";
 }
 
@@ -547,52 +557,254 @@ function updateHotTicker(local) {
     `  |  Kapalıçarşı Alış: ${pAlis.toFixed(2)} TL • Satış: ${pSatis.toFixed(2)} TL`;
 }
 
+function renderNewsData(data) {
+  renderNews(document.getElementById("news-national"), data.national, false);
+  renderNews(document.getElementById("news-international"), data.international, true);
+  const summaryEl = document.getElementById("news-summary");
+  if (summaryEl) {
+    summaryEl.textContent = buildNewsSummary(data.national, data.international);
+  }
+  const updatedEl = document.getElementById("news-updated");
+  if (updatedEl) {
+    updatedEl.textContent = data.updated_at ? `Son güncelleme: ${data.updated_at}` : "--:--:--";
+  }
+}
+
 async function updateNews() {
   try {
     const res = await fetch("/api/news");
     if (!res.ok) throw new Error("News API error");
     const data = await res.json();
-    renderNews(document.getElementById("news-national"), data.national, false);
-    renderNews(document.getElementById("news-international"), data.international, true);
-    const summaryEl = document.getElementById("news-summary");
-    if (summaryEl) {
-      summaryEl.textContent = buildNewsSummary(data.national, data.international);
-    }
-    const updatedEl = document.getElementById("news-updated");
-    if (updatedEl) {
-      updatedEl.textContent = data.updated_at ? `Son güncelleme: ${data.updated_at}` : "--:--:--";
-    }
+    renderNewsData(data);
+    clearTimeout(newsRetryTimer);
+    newsRetryTimer = data.status === "live" ? null : setTimeout(updateNews, NEWS_RETRY_MS);
   } catch (err) {
     console.error("News update failed", err);
   }
 }
 
-async function updateDashboard() {
-  try {
-    const res = await fetch(`/api/metrics?range=${encodeURIComponent(currentRange)}`, {
-      cache: "no-store",
-    });
-    if (!res.ok) throw new Error("API error");
-    const data = await res.json();
+function renderQuote(local, analysis) {
+  // Spread + Signal
+  const spreadVal = document.getElementById("spread-val");
+  const spreadPct = document.getElementById("spread-pct");
+  const signalText = document.getElementById("signal-text");
+
+  if (spreadVal) spreadVal.textContent = analysis.spread_tl.toFixed(2);
+  if (spreadPct) spreadPct.textContent = analysis.spread_pct.toFixed(2) + "%";
+  if (signalText) signalText.textContent = analysis.signal;
+
+  // Spread card background color
+  const spreadCard = spreadVal ? spreadVal.closest(".card") : null;
+  if (spreadCard) {
+    if (analysis.spread_pct > 1.5) {
+      spreadCard.style.background = "#3a1414"; // red tint
+    } else {
+      spreadCard.style.background = "#123022"; // green tint
+    }
+  }
+
+  // Local data
+  const gramPrice = local.piyasa.satis;
+  const arbitrage = Number.isFinite(analysis.arbitrage)
+    ? analysis.arbitrage
+    : local.piyasa.satis - local.garanti.alis;
+
+  const gramPriceEl = document.getElementById("gram-price");
+  const arbitrageEl = document.getElementById("arbitrage-val");
+  if (gramPriceEl) gramPriceEl.textContent = gramPrice.toFixed(2);
+  if (arbitrageEl) arbitrageEl.textContent = arbitrage.toFixed(2);
+
+  updateHotTicker(local);
+
+  const commentEl = document.getElementById("market-comment");
+  if (commentEl && lastGlobal) {
+    commentEl.textContent = buildMarketComment(
+      lastGlobal.ONS || { price: 0, change: 0 },
+      lastGlobal.USDTRY || { price: 0, change: 0 },
+      lastGlobal.US10Y || { price: 0, change: 0 },
+      analysis.spread_pct
+    );
+  }
+}
 
-    // Spread + Signal
-    const spreadVal = document.getElementById("spread-val");
-    const spreadPct = document.getElementById("spread-pct");
-    const signalText = document.getElementById("signal-text");
+const MAIN_HISTORY_KEYS = ["dates", "timestamps", "ons_prices", "usd_prices", "us10y_prices", "gram_prices"];
+const ARBITRAGE_HISTORY_KEYS = ["arbitrage_dates", "arbitrage_timestamps", "arbitrage_prices"];
+
+// Sütun bazlı ikili biçim: "GIC1" | uint32 başlık uzunluğu | JSON başlık | 8 bayta hizalı sütunlar
+const COMPACT_MEDIA_TYPE = "application/vnd.goldinsight.compact";
+const COMPACT_SUPPORTED = typeof TextDecoder !== "undefined" && typeof DataView !== "undefined";
+const COMPACT_ARRAY_TYPES = { f4: Float32Array, f8: Float64Array, i4: Int32Array };
+const MONTH_ABBR = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"];
+
+const PAD2 = Array.from({ length: 100 }, (_, i) => String(i).padStart(2, "0"));
+
+const UTC_LABEL_FIELDS = {
+  H: (state) => PAD2[Math.floor(state.seconds / 3600)],
+  M: (state) => PAD2[Math.floor(state.seconds / 60) % 60],
+  d: (state) => PAD2[state.date.getUTCDate()],
+  m: (state) => PAD2[state.date.getUTCMonth() + 1],
+  b: (state) => MONTH_ABBR[state.date.getUTCMonth()],
+  y: (state) => PAD2[state.date.getUTCFullYear() % 100],
+  Y: (state) => String(state.date.getUTCFullYear()),
+};
 
-    if (spreadVal) spreadVal.textContent = data.analysis.spread_tl.toFixed(2);
-    if (spreadPct) spreadPct.textContent = data.analysis.spread_pct.toFixed(2) + "%";
-    if (signalText) signalText.textContent = data.analysis.signal;
+// Sunucunun strftime etiketlerini UTC'de aynen üretir; biçim bir kez alan fonksiyonlarına
+// derlenir, zaman damgaları sıralı geldiği için Date yalnızca gün değişince oluşturulur
+function utcLabelFormatter(fmt) {
+  const getters = fmt
+    .split(/(%.)/)
+    .filter(Boolean)
+    .map((part) => (part[0] === "%" && UTC_LABEL_FIELDS[part[1]]) || (() => part));
+  const state = { day: NaN, date: null, seconds: 0 };
+  return (ts) => {
+    const day = Math.floor(ts / 86400);
+    if (day !== state.day) {
+      state.day = day;
+      state.date = new Date(day * 86400000);
+    }
+    state.seconds = ts - day * 86400;
+    let label = "";
+    for (let i = 0; i < getters.length; i += 1) label += getters[i](state);
+    return label;
+  };
+}
 
-    // Spread card background color
-    const spreadCard = spreadVal ? spreadVal.closest(".card") : null;
-    if (spreadCard) {
-      if (data.analysis.spread_pct > 1.5) {
-        spreadCard.style.background = "#3a1414"; // red tint
+function compactTimestamps(timeline, offsets) {
+  const timestamps = new Float64Array(timeline.count);
+  for (let i = 0; i < timeline.count; i += 1) {
+    timestamps[i] = timeline.base + (offsets ? offsets[i] : i * timeline.step);
+  }
+  return timestamps;
+}
+
+// Float32 değerler sunucudaki basamağa yuvarlanınca JSON ile aynı sayılar elde edilir
+function compactValues(packed, digits) {
+  const scale = 10 ** digits;
+  const values = new Float64Array(packed.length);
+  for (let i = 0; i < packed.length; i += 1) values[i] = Math.round(packed[i] * scale) / scale;
+  return values;
+}
+
+function decodeCompact(buffer) {
+  const headerLength = new DataView(buffer).getUint32(4, true);
+  const payload = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+  const dataStart = 8 + headerLength;
+  const history = payload.global.history;
+  const { columns, timelines } = history;
+  delete history.columns;
+  delete history.timelines;
+
+  const views = {};
+  columns.forEach((column) => {
+    const ArrayType = COMPACT_ARRAY_TYPES[column.type];
+    views[column.name] = new ArrayType(buffer, dataStart + column.offset, column.count);
+  });
+  // Arbitraj ekseni çoğunlukla ana eksenle aynıdır; etiketler bir kez üretilir
+  const labelCache = {};
+  Object.keys(timelines).forEach((tsKey) => {
+    const timeline = timelines[tsKey];
+    const timestamps = compactTimestamps(timeline, views[tsKey]);
+    let labels = timeline.dates;
+    if (!labels && !timeline.count) labels = [];
+    if (!labels) {
+      // Arbitraj kovalarının etiketi yerel saattir; zaman damgası gerçek epoch olduğundan ofset eklenir
+      const offset = timeline.label_offset || 0;
+      const cacheKey = views[tsKey]
+        ? null
+        : `${timeline.date_fmt}|${timeline.base + offset}|${timeline.step}|${timeline.count}`;
+      if (cacheKey && labelCache[cacheKey]) {
+        labels = labelCache[cacheKey];
       } else {
-        spreadCard.style.background = "#123022"; // green tint
+        const format = utcLabelFormatter(timeline.date_fmt);
+        labels = Array.from(timestamps, (ts) => format(ts + offset));
       }
+      if (cacheKey) labelCache[cacheKey] = labels;
+    }
+    history[tsKey] = timestamps;
+    history[`${tsKey.slice(0, -"timestamps".length)}dates`] = labels;
+  });
+  columns.forEach((column) => {
+    if (column.digits !== undefined) history[column.name] = compactValues(views[column.name], column.digits);
+  });
+  return payload;
+}
+
+function historyCursor(rangeKey) {
+  if (!historyState || historyState.range !== rangeKey) return null;
+  const lastMain = historyState.timestamps[historyState.timestamps.length - 1];
+  const lastArb = historyState.arbitrage_timestamps[historyState.arbitrage_timestamps.length - 1];
+  const candidates = [lastMain, lastArb].filter((v) => Number.isFinite(v));
+  return candidates.length ? Math.min(...candidates) : null;
+}
+
+// Sunucudan gelen since sonrası noktaları mevcut dizilere yerinde ekler
+function mergeTimeline(state, history, keys, tsKey, windowStart) {
+  const oldTs = state[tsKey];
+  const newTs = history[tsKey] || [];
+  const firstNew = newTs.length ? newTs[0] : Infinity;
+  let cut = oldTs.length;
+  while (cut > 0 && oldTs[cut - 1] >= firstNew) cut -= 1;
+  let drop = 0;
+  while (drop < cut && oldTs[drop] < windowStart) drop += 1;
+  keys.forEach((key) => {
+    const target = state[key];
+    target.length = Math.min(target.length, cut);
+    target.splice(0, drop);
+    (history[key] || []).forEach((value) => target.push(value));
+  });
+}
+
+function replaceTimeline(state, history, keys) {
+  keys.forEach((key) => {
+    const values = history[key];
+    state[key] = Array.isArray(values) || ArrayBuffer.isView(values) ? Array.from(values) : [];
+  });
+}
+
+function applyHistory(rangeKey, history) {
+  const sameRange = historyState && historyState.range === rangeKey;
+  if (!sameRange) historyState = { range: rangeKey };
+  if (sameRange && history.delta) {
+    mergeTimeline(historyState, history, MAIN_HISTORY_KEYS, "timestamps", history.window_start);
+  } else {
+    replaceTimeline(historyState, history, MAIN_HISTORY_KEYS);
+  }
+  if (sameRange && history.arbitrage_delta) {
+    mergeTimeline(
+      historyState,
+      history,
+      ARBITRAGE_HISTORY_KEYS,
+      "arbitrage_timestamps",
+      history.arbitrage_window_start
+    );
+  } else {
+    replaceTimeline(historyState, history, ARBITRAGE_HISTORY_KEYS);
+  }
+}
+
+async function updateDashboard() {
+  try {
+    const requestedRange = currentRange;
+    const headers = {};
+    if (COMPACT_SUPPORTED) headers.Accept = COMPACT_MEDIA_TYPE;
+    if (metricsEtag && lastRenderedRange === requestedRange) {
+      headers["If-None-Match"] = metricsEtag;
     }
+    const since = historyCursor(requestedRange);
+    const query = since === null ? "" : `&since=${since}`;
+    const res = await fetch(`/api/metrics?range=${encodeURIComponent(requestedRange)}${query}`, {
+      cache: "no-store",
+      headers,
+    });
+    // Veri değişmediyse sunucu 304 döner; ekrandaki değerler geçerli
+    if (res.status === 304) return;
+    if (!res.ok) throw new Error("API error");
+    const contentType = res.headers.get("Content-Type") || "";
+    const data = contentType.startsWith(COMPACT_MEDIA_TYPE)
+      ? decodeCompact(await res.arrayBuffer())
+      : await res.json();
+    if (requestedRange !== currentRange) return;
+    metricsEtag = res.headers.get("ETag");
 
     // Global data
     const ons = data.global.ONS || { price: 0, change: 0 };
@@ -617,38 +829,19 @@ async function updateDashboard() {
     setChangeColor("usdtry-change", usdtry.change);
     setChangeColor("us10y-change", us10y.change);
 
-    // Local data
-    const gramPrice = data.local.piyasa.satis;
-    const arbitrage = Number.isFinite(data.analysis.arbitrage)
-      ? data.analysis.arbitrage
-      : data.local.piyasa.satis - data.local.garanti.alis;
-
-    const gramPriceEl = document.getElementById("gram-price");
-    const arbitrageEl = document.getElementById("arbitrage-val");
-    if (gramPriceEl) gramPriceEl.textContent = gramPrice.toFixed(2);
-    if (arbitrageEl) arbitrageEl.textContent = arbitrage.toFixed(2);
-
-    updateHotTicker(data.local);
-
-    const commentEl = document.getElementById("market-comment");
-    if (commentEl) {
-      commentEl.textContent = buildMarketComment(
-        ons,
-        usdtry,
-        us10y,
-        data.analysis.spread_pct
-      );
-    }
+    lastGlobal = data.global;
+    renderQuote(data.local, data.analysis);
 
     // Charts
     const history = (data.global && data.global.history) || data.history || {};
-    const labels = history.dates || [];
-    const onsValues = history.ons_prices || [];
-    const usdValues = history.usd_prices || [];
-    const us10yValues = history.us10y_prices || [];
-    const gramValues = history.gram_prices || [];
-    const arbitrageValues = history.arbitrage_prices || [];
-    const arbitrageLabels = history.arbitrage_dates || labels;
+    applyHistory(requestedRange, history);
+    const labels = historyState.dates;
+    const onsValues = historyState.ons_prices;
+    const usdValues = historyState.usd_prices;
+    const us10yValues = historyState.us10y_prices;
+    const gramValues = historyState.gram_prices;
+    const arbitrageValues = historyState.arbitrage_prices;
+    const arbitrageLabels = historyState.arbitrage_dates.length ? historyState.arbitrage_dates : labels;
 
     setRangeStatus(labels.length);
 
@@ -772,10 +965,53 @@ document.addEventListener("click", (event) => {
   updateDashboard();
 });
 
+function startPolling() {
+  if (!metricsTimer) metricsTimer = setInterval(updateDashboard, 10000);
+  if (!newsTimer) newsTimer = setInterval(updateNews, 300000);
+}
+
+function stopPolling() {
+  if (metricsTimer) clearInterval(metricsTimer);
+  if (newsTimer) clearInterval(newsTimer);
+  metricsTimer = null;
+  newsTimer = null;
+}
+
+// Sunucu değişiklikleri SSE ile iter; bağlantı yoksa polling'e geri dönülür
+function startStream() {
+  if (!window.EventSource) {
+    startPolling();
+    return;
+  }
+  const source = new EventSource("/api/stream");
+  let failures = 0;
+  source.addEventListener("open", () => {
+    failures = 0;
+    stopPolling();
+  });
+  source.addEventListener("quote", (event) => {
+    const data = JSON.parse(event.data);
+    renderQuote(data.local, data.analysis);
+  });
+  source.addEventListener("history", (event) => {
+    const data = JSON.parse(event.data);
+    if (!Array.isArray(data.ranges) || data.ranges.includes(currentRange)) {
+      updateDashboard();
+    }
+  });
+  source.addEventListener("news", (event) => {
+    renderNewsData(JSON.parse(event.data));
+  });
+  source.addEventListener("error", () => {
+    failures += 1;
+    startPolling();
+    if (failures >= STREAM_MAX_FAILURES) source.close();
+  });
+}
+
 // Initial + interval
 updateDashboard();
 updateClock();
 updateNews();
-setInterval(updateDashboard, 10000);
+startStream();
 setInterval(updateClock, 1000);
-setInterval(updateNews, 300000);